@@ -0,0 +1,129 @@
+"""asyncpg engine for the async read path (async_routes.py).
+
+Flask views stay synchronous, so the async engine lives on one event loop per
+worker process, run by a daemon thread. A view builds its statements, hands
+them to ``async_db.gather()`` and blocks until they are all back: the
+statements of one page run concurrently on separate pooled connections, and
+the requests of every thread in the worker (gunicorn --threads) share the
+loop and its pool instead of each holding a connection of its own.
+
+Like the sync session (see RoutingSession in models.py), the statements of a
+@read_only view go to the replica replicas.py picked for the request: there
+is one engine per database URL, the primary's and every replica's.
+
+The loop, its thread and the engines are created on first use in each
+process, so nothing of them is inherited across gunicorn's fork. Every new
+engine is handed to ``on_engine``, which gives it the sync engines' listeners
+(see app.py). The statements run on the loop's thread, so the request's
+query recorders and endpoint travel with them on their connection's info.
+"""
+import asyncio
+import os
+import threading
+
+from sqlalchemy.engine import make_url
+from flask import has_request_context, request
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from db_pool import async_engine_options, configure_engine
+from query_stats import query_stats
+from replicas import replicas
+
+
+class AsyncDB(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self.loop = None
+        self.engines = {}
+        self.urls = {}
+        self.options = {}
+        self.config = {}
+        self.timeout = None
+        # called with (engine.sync_engine, bind name) for every engine created
+        self.on_engine = None
+
+    def init_app(self, app):
+        # keyed like replicas.py's binds, None being the primary
+        self.urls = {None: app.config['SQLALCHEMY_DATABASE_URI']}
+        self.urls.update((name, url) for name, url in (app.config.get('SQLALCHEMY_BINDS') or {}).items()
+                         if name.startswith('replica_'))
+        self.urls = {name: make_url(url).set(drivername='postgresql+asyncpg') for name, url in self.urls.items()}
+        self.options = {None: async_engine_options(app.config)}
+        for name, url in list(self.urls.items()):
+            if name is not None and 'connect_timeout' in url.query:
+                # libpq's connect_timeout (see replica_binds()) is asyncpg's timeout
+                options = dict(self.options[None])
+                options['connect_args'] = dict(options.get('connect_args', {}),
+                                               timeout=float(url.query['connect_timeout']))
+                self.options[name] = options
+                self.urls[name] = url.difference_update_query(['connect_timeout'])
+        self.config = app.config
+        timeout = app.config['DB_STATEMENT_TIMEOUT']
+        # a little longer than the statement timeout, so Postgres reports first
+        self.timeout = timeout / 1000.0 + 5 if timeout else None
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='async-db', daemon=True)
+            thread.start()
+            self.loop = loop
+            self.engines = {}
+            self._pid = os.getpid()
+
+    def engine(self, name=None):
+        engine = self.engines.get(name)
+        if engine is None:
+            with self._lock:
+                engine = self.engines.get(name)
+                if engine is None:
+                    engine = create_async_engine(self.urls[name], **self.options.get(name, self.options[None]))
+                    # SET LOCAL statement_timeout behind PgBouncer, as on the
+                    # sync engines
+                    configure_engine(engine.sync_engine, self.config)
+                    if self.on_engine is not None:
+                        self.on_engine(engine.sync_engine, name)
+                    self.engines[name] = engine
+        return engine
+
+    def run(self, coroutine):
+        if self._pid != os.getpid():
+            self._start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(self.timeout)
+
+    async def fetch(self, engine, statement, scope):
+        # one session, and so one connection, per statement so they can overlap
+        async with AsyncSession(engine) as session:
+            info = (await session.connection()).sync_connection.info
+            info.update(scope)
+            try:
+                return (await session.execute(statement)).all()
+            finally:
+                for key in scope:
+                    info.pop(key, None)
+
+    async def _gather(self, engine, statements, scope):
+        return await asyncio.gather(*[self.fetch(engine, statement, scope) for statement in statements])
+
+    def scope(self):
+        # what query_stats.py and slow_queries.py read on the request's thread
+        scope = {'query_recorders': list(query_stats.active)}
+        if has_request_context():
+            scope['request_info'] = {'endpoint': request.endpoint, 'method': request.method, 'path': request.path}
+        return scope
+
+    def gather(self, *statements):
+        """Run the statements concurrently, returns their rows in order."""
+        if self._pid != os.getpid():
+            self._start()
+        # picked on the request's thread, where the app context is
+        replica = replicas.current()
+        engine = self.engine(replica.name if replica is not None else None)
+        return self.run(self._gather(engine, statements, self.scope()))
+
+
+async_db = AsyncDB()
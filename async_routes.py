@@ -0,0 +1,141 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import sys
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, abort
+from sqlalchemy import select
+from models import Venue, Artist
+from async_db import async_db
+from cache import page_cache
+from replicas import read_only
+from conditional import conditional, page_version, venues_state, artists_state, shows_state, venue_state, artist_state
+from queries import page_size, show_cursors, show_page_query, show_page, venue_areas, venues_with_upcoming_counts, \
+  artists_with_upcoming_counts, listing_filters, filter_listing, listing_page_query, listing_page, \
+  venue_shows, artist_shows, show_window_queries, venue_page, artist_page
+
+# The read-only pages again, under /async, with their queries run on the
+# asyncpg engine (see async_db.py). Statements are built by the same helpers
+# as the sync views in routes.py and rendered by the same templates, so the
+# two paths can be compared page for page; the detail pages share the sync
+# views' page cache entries. They read from the replicas (@read_only) and
+# answer conditional GETs (@conditional) like the sync views; the validator
+# is a single query of index lookups, run on the sync session.
+bp = Blueprint('reads', __name__, url_prefix='/async')
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@bp.route('/venues')
+@read_only
+@conditional(venues_state)
+def venues():
+  try:
+    filters = listing_filters(request.args)
+  except ValueError:
+    abort(400)
+  per_page = page_size(current_app.config['LISTING_PER_PAGE'], current_app.config['LISTING_MAX_PER_PAGE'])
+  after = request.args.get('after', type=int)
+  before = request.args.get('before', type=int)
+  try:
+    query = filter_listing(venues_with_upcoming_counts(), Venue, filters)
+    venues, = async_db.gather(listing_page_query(query, Venue, per_page, after, before).statement)
+    venues, pager = listing_page(venues, per_page, after, before)
+  except:
+    print(sys.exc_info())
+    return render_template('errors/500.html'), 500
+  if venues == [] and not (filters or after or before):
+    return render_template('errors/404.html')
+  return render_template('pages/venues.html', areas=venue_areas(venues), pager=pager, filters=filters)
+
+@bp.route('/venues/<int:venue_id>')
+@read_only
+@conditional(venue_state)
+def show_venue(venue_id):
+  version = page_version()
+  if version is not None:
+    page = page_cache.get(('venue', venue_id), version)
+    if page is not None:
+      return page
+  try:
+    # the venue row (counts included) and both show windows are independent,
+    # so the three statements are in flight at the same time
+    upcoming, past = show_window_queries(venue_shows(venue_id), current_app.config['DETAIL_SHOWS_LIMIT'])
+    venue, upcoming_shows, past_shows = async_db.gather(
+      select(Venue).where(Venue.id == venue_id), upcoming.statement, past.statement)
+  except:
+    print(sys.exc_info())
+    return render_template('errors/500.html'), 500
+  if not venue:
+    abort(404)
+  data = venue_page(venue[0][0], upcoming_shows, past_shows)
+  page = render_template('pages/show_venue.html', venue=data)
+  if version is not None:
+    page_cache.set(('venue', venue_id), page, version)
+  return page
+
+@bp.route('/artists')
+@read_only
+@conditional(artists_state)
+def artists():
+  try:
+    filters = listing_filters(request.args)
+  except ValueError:
+    abort(400)
+  per_page = page_size(current_app.config['LISTING_PER_PAGE'], current_app.config['LISTING_MAX_PER_PAGE'])
+  after = request.args.get('after', type=int)
+  before = request.args.get('before', type=int)
+  try:
+    query = filter_listing(artists_with_upcoming_counts(), Artist, filters)
+    artists, = async_db.gather(listing_page_query(query, Artist, per_page, after, before).statement)
+    artists, pager = listing_page(artists, per_page, after, before)
+  except:
+    print(sys.exc_info())
+    return render_template('errors/500.html'), 500
+  if artists == [] and not (filters or after or before):
+    return render_template('errors/404.html')
+  return render_template('pages/artists.html', artists=artists, pager=pager, filters=filters)
+
+@bp.route('/artists/<int:artist_id>')
+@read_only
+@conditional(artist_state)
+def show_artist(artist_id):
+  version = page_version()
+  if version is not None:
+    page = page_cache.get(('artist', artist_id), version)
+    if page is not None:
+      return page
+  try:
+    upcoming, past = show_window_queries(artist_shows(artist_id), current_app.config['DETAIL_SHOWS_LIMIT'])
+    artist, upcoming_shows, past_shows = async_db.gather(
+      select(Artist).where(Artist.id == artist_id), upcoming.statement, past.statement)
+  except:
+    print(sys.exc_info())
+    return render_template('errors/500.html'), 500
+  if not artist:
+    abort(404)
+  data = artist_page(artist[0][0], upcoming_shows, past_shows)
+  page = render_template('pages/show_artist.html', artist=data)
+  if version is not None:
+    page_cache.set(('artist', artist_id), page, version)
+  return page
+
+@bp.route('/shows')
+@read_only
+@conditional(shows_state)
+def shows():
+  per_page = page_size(current_app.config['SHOWS_PER_PAGE'], current_app.config['SHOWS_MAX_PER_PAGE'])
+  try:
+    after, before = show_cursors(request.args)
+  except ValueError:
+    abort(400)
+  try:
+    shows, = async_db.gather(show_page_query(per_page, after, before).statement)
+    data, pager = show_page(shows, per_page, after, before)
+  except:
+    print(sys.exc_info())
+    return render_template('errors/500.html'), 500
+  if data == [] and not (after or before):
+    return redirect(url_for('main.create_shows'))
+  return render_template('pages/shows.html', shows=data, pager=pager)
@@ -0,0 +1,69 @@
+"""Show tile rendering benchmark.
+
+Renders pages/shows.html with 10k show tiles through the datetime filter,
+once with datetime objects (what the controllers pass) and once with the
+strings they used to pass, and prints the timings as JSON. Needs no database.
+
+    python benchmarks/filter_bench.py --tiles 10000 --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pytz import utc
+from flask import render_template
+from app import app
+
+
+def tiles(count, as_string):
+  start = datetime(2035, 4, 1, 20, 0, tzinfo=utc)
+  data = []
+  for i in range(count):
+    start_time = start + timedelta(hours=i)
+    data.append({
+      'venue_id': i % 50,
+      'venue_name': 'Venue %d' % (i % 50),
+      'artist_id': i % 200,
+      'artist_name': 'Artist %d' % (i % 200),
+      'artist_image_link': '',
+      'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S') if as_string else start_time,
+    })
+  return data
+
+
+def time_render(data, runs):
+  samples = []
+  with app.test_request_context('/shows'):
+    for _ in range(runs):
+      started = time.perf_counter()
+      render_template('pages/shows.html', shows=data, pager={})
+      samples.append((time.perf_counter() - started) * 1000.0)
+  return {
+    'median_ms': round(statistics.median(samples), 3),
+    'min_ms': round(min(samples), 3),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--tiles', type=int, default=10000)
+  parser.add_argument('--runs', type=int, default=5)
+  args = parser.parse_args()
+
+  result = {
+    'tiles': args.tiles,
+    'runs': args.runs,
+    'datetime_input': time_render(tiles(args.tiles, False), args.runs),
+    'iso_string_input': time_render(tiles(args.tiles, True), args.runs),
+  }
+  print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,115 @@
+"""Search latency benchmark.
+
+Seeds a scratch database, named explicitly with --database-url (never the
+configured development database), with synthetic artists and venues (1M of
+each by default), then times /artists/search and /venues/search through the
+Flask test client and prints p50/p95/p99 latencies as JSON.
+
+    createdb fyyur_bench
+    python benchmarks/search_bench.py --database-url postgresql://localhost/fyyur_bench --rows 1000000 --runs 200
+
+Seeded rows are named 'bench ...' and removed afterwards, also when the run
+fails, unless --keep is given.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+WORDS = ['Blue', 'Velvet', 'Electric', 'Hop', 'Musical', 'Sax', 'Band', 'Petals',
+         'Coffee', 'Square', 'Park', 'Live', 'Wild', 'Dueling', 'Pianos', 'Bar',
+         'Guns', 'Moon', 'River', 'Hall', 'Garden', 'Lounge', 'Club', 'Theatre']
+
+TERMS = ['band', 'Hop', 'music', 'velvet moon', 'sqare', 'electrc', 'the wild', 'a']
+
+SEED_SQL = '''
+INSERT INTO "{table}" (name, city, state, {flag})
+SELECT 'bench ' || w[1 + (i * 7) % n] || ' ' || w[1 + (i * 13) % n] || ' ' || w[1 + (i * 31) % n] || ' ' || i,
+       'Bench City', 'CA', false
+FROM generate_series(1, :rows) AS i,
+     (SELECT CAST(:words AS varchar[]) AS w, :n AS n) AS words
+'''
+
+
+def seed(db, rows):
+  db.create_all(bind=None)
+  for table, flag in (('Artist', 'seeking_venue'), ('Venue', 'seeking_talent')):
+    db.session.execute(db.text(SEED_SQL.format(table=table, flag=flag)),
+                       {'rows': rows, 'words': WORDS, 'n': len(WORDS)})
+    db.session.execute(db.text('ANALYZE "{}"'.format(table)))
+  db.session.commit()
+
+
+def cleanup(db):
+  db.session.rollback()
+  for table in ('Artist', 'Venue'):
+    db.session.execute(db.text('DELETE FROM "{}" WHERE name LIKE \'bench %\''.format(table)))
+  db.session.commit()
+
+
+def percentile(samples, pct):
+  ordered = sorted(samples)
+  return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def time_route(client, path, runs):
+  samples = []
+  for i in range(runs):
+    term = TERMS[i % len(TERMS)]
+    started = time.perf_counter()
+    response = client.post(path, data={'search_term': term})
+    samples.append((time.perf_counter() - started) * 1000.0)
+    assert response.status_code == 200, (path, response.status_code)
+  return {
+    'runs': runs,
+    'p50_ms': round(percentile(samples, 50), 3),
+    'p95_ms': round(percentile(samples, 95), 3),
+    'p99_ms': round(percentile(samples, 99), 3),
+    'mean_ms': round(statistics.mean(samples), 3),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url', required=True,
+                      help='scratch database to seed, e.g. postgresql://localhost/fyyur_bench')
+  parser.add_argument('--rows', type=int, default=1000000)
+  parser.add_argument('--runs', type=int, default=200)
+  parser.add_argument('--keep', action='store_true', help='leave the seeded rows in place')
+  args = parser.parse_args()
+
+  # the app reads DATABASE_URL at import time; replicas would not see the
+  # seeded rows, so the searches stay on the scratch database
+  os.environ['DATABASE_URL'] = args.database_url
+  os.environ['DATABASE_REPLICA_URLS'] = ''
+  from app import app
+  from models import db
+
+  app.config['WTF_CSRF_ENABLED'] = False
+  with app.app_context():
+    try:
+      started = time.perf_counter()
+      seed(db, args.rows)
+      seeded_in = time.perf_counter() - started
+      client = app.test_client()
+      result = {
+        'rows': args.rows,
+        'seed_seconds': round(seeded_in, 2),
+        'limit': app.config['SEARCH_RESULTS_LIMIT'],
+        'routes': {
+          '/artists/search': time_route(client, '/artists/search', args.runs),
+          '/venues/search': time_route(client, '/venues/search', args.runs),
+        },
+      }
+    finally:
+      if not args.keep:
+        cleanup(db)
+  print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,78 @@
+"""Worker cold-start benchmark.
+
+Starts a fresh interpreter per run, the way a gunicorn worker does without
+--preload, and times importing app.py (which builds the app through
+create_app()), loading every template and serving the first request. Prints
+the median and worst case of each phase as JSON.
+
+Templates load from TEMPLATE_CACHE_DIR, filled by an untimed first run;
+--no-template-cache compiles them from source every run instead, which is
+what each worker did before the bytecode cache.
+
+    python benchmarks/startup_bench.py --runs 20
+    python benchmarks/startup_bench.py --runs 20 --no-template-cache
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PROBE = '''
+import json, time
+started = time.perf_counter()
+from app import app
+from template_cache import load_templates
+imported = time.perf_counter()
+load_templates(app)
+compiled = time.perf_counter()
+response = app.test_client().get('/')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+  'import_ms': (imported - started) * 1000.0,
+  'templates_ms': (compiled - imported) * 1000.0,
+  'first_request_ms': (served - compiled) * 1000.0,
+  'total_ms': (served - started) * 1000.0,
+}))
+'''
+
+
+def run_once(env=None):
+  output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=ROOT, env=env)
+  return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def summarize(samples, key):
+  values = [sample[key] for sample in samples]
+  return {
+    'median_ms': round(statistics.median(values), 3),
+    'max_ms': round(max(values), 3),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--runs', type=int, default=20)
+  parser.add_argument('--no-template-cache', action='store_true',
+                      help='Compile the templates from source in every run.')
+  args = parser.parse_args()
+
+  env = dict(os.environ)
+  if args.no_template_cache:
+    env['TEMPLATE_CACHE_DIR'] = ''
+  else:
+    # fills the cache, as `flask compile-templates` would at build time
+    run_once(env)
+  samples = [run_once(env) for _ in range(args.runs)]
+  result = {'runs': args.runs, 'template_cache': not args.no_template_cache}
+  for key in ('import_ms', 'templates_ms', 'first_request_ms', 'total_ms'):
+    result[key[:-3]] = summarize(samples, key)
+  print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+  main()
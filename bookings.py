@@ -0,0 +1,91 @@
+"""Show bookings: no venue or artist is booked twice at the same time.
+
+Every show occupies tstzrange(start_time, end_time). Two exclusion
+constraints on "Shows" (see models.py) reject a show overlapping another at
+the same venue or with the same artist; their GiST indexes (btree_gist puts
+the venue_id / artist_id equality in the same index) are also what
+``free_slots()`` reads.
+
+Shows with double_booked set are exempt. Those are shows that already
+overlapped when the constraints were added, and shows ``flask generate``
+could not fit in. They still hold their venue and artist: new shows are
+checked against them explicitly (``flagged_clash()`` and the importer's
+validation), through the partial GiST indexes covering the flagged shows. ``settle_bookings()`` decides the flag the same way for
+both: walking each venue's and each artist's shows in start order, a show
+is double-booked when it starts before an earlier one has ended. The shows
+left unflagged can never overlap each other.
+"""
+from datetime import timedelta
+
+from sqlalchemy import text
+
+from models import db, Shows
+
+# SQLSTATE of an exclusion constraint violation, see create_show_submission()
+EXCLUSION_VIOLATION = '23P01'
+
+OVERLAPS_EARLIER = '''
+SELECT id, coalesce(max(end_time) OVER (PARTITION BY venue_id ORDER BY start_time, id
+                                        ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) > start_time, false)
+        OR coalesce(max(end_time) OVER (PARTITION BY artist_id ORDER BY start_time, id
+                                        ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) > start_time, false)
+       AS clashes
+FROM "Shows" WHERE start_time IS NOT NULL
+'''
+
+
+def settle_bookings():
+    """Recompute double_booked for every show; returns how many are set."""
+    with db.engine.begin() as conn:
+        # flag first, then clear: every intermediate state keeps the
+        # unflagged shows free of overlaps, so the constraints never fire
+        conn.execute(text('UPDATE "Shows" s SET double_booked = true FROM (%s) AS o '
+                          'WHERE s.id = o.id AND o.clashes AND NOT s.double_booked' % OVERLAPS_EARLIER))
+        conn.execute(text('UPDATE "Shows" s SET double_booked = false FROM (%s) AS o '
+                          'WHERE s.id = o.id AND NOT o.clashes AND s.double_booked' % OVERLAPS_EARLIER))
+        return conn.execute(text('SELECT count(*) FROM "Shows" WHERE double_booked')).scalar()
+
+
+def booked_range():
+    return db.func.tstzrange(Shows.start_time, Shows.end_time)
+
+
+def window_range(start, end):
+    return db.func.tstzrange(db.cast(start, db.DateTime(timezone=True)),
+                             db.cast(end, db.DateTime(timezone=True)))
+
+
+def flagged_clash(venue_id, artist_id, start, end):
+    """Whether a double-booked show holds the venue or the artist during
+    [start, end); the exclusion constraints do not look at those."""
+    overlapping = [Shows.start_time != None, Shows.double_booked,
+                   booked_range().op('&&')(window_range(start, end))]
+    # one probe into each of the partial indexes over the flagged shows
+    at_venue = db.select(Shows.id).where(Shows.venue_id == venue_id, *overlapping)
+    with_artist = db.select(Shows.id).where(Shows.artist_id == artist_id, *overlapping)
+    return db.select(db.or_(at_venue.exists(), with_artist.exists()))
+
+
+def busy_query(venue_id, start, end):
+    """The venue's shows overlapping [start, end), earliest first."""
+    window = window_range(start, end)
+    overlapping = [Shows.venue_id == venue_id, Shows.start_time != None, booked_range().op('&&')(window)]
+    # one query per partial index: the exclusion constraint's and the one
+    # covering the exempt shows
+    booked = db.select(Shows.start_time, Shows.end_time).where(*overlapping, db.not_(Shows.double_booked))
+    exempt = db.select(Shows.start_time, Shows.end_time).where(*overlapping, Shows.double_booked)
+    both = db.union_all(booked, exempt).subquery()
+    return db.select(both.c.start_time, both.c.end_time).order_by(both.c.start_time)
+
+
+def free_slots(busy, start, end, min_length=timedelta(0)):
+    """The gaps of at least min_length between the busy (start, end) pairs."""
+    slots = []
+    cursor = start
+    for busy_start, busy_end in busy:
+        if busy_start - cursor >= min_length and busy_start > cursor:
+            slots.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+    if end - cursor >= min_length and end > cursor:
+        slots.append((cursor, end))
+    return slots
@@ -0,0 +1,77 @@
+"""In-process cache for rendered pages.
+
+Entries expire after a fixed TTL and the least recently used entry is evicted
+once the cache is full.
+
+Every gunicorn worker has its own copy, and a write handler can only drop
+the keys it touches from its own. So each entry is stored with the version
+it was rendered for, a digest of the page's validator (the updated_at values
+behind its ETag, see conditional.py), and is only returned for that same
+version: a write moves the version forward in the database, and the entry
+misses in every worker from the next request on. The explicit invalidation
+only frees the memory early.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class PageCache(object):
+
+    def __init__(self, max_entries=1024, ttl=60, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        # called with True / False after every lookup, see metrics.py
+        self.on_lookup = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config['PAGE_CACHE_SIZE']
+        self.ttl = app.config['PAGE_CACHE_TTL']
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock() or entry[1] != version:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                value = None
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                value = entry[2]
+        if self.on_lookup is not None:
+            self.on_lookup(value is not None)
+        return value
+
+    def set(self, key, value, version):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# rendered artist / venue pages, see queries.venue_page_keys() and
+# queries.artist_page_keys()
+page_cache = PageCache()
@@ -0,0 +1,123 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+import time
+import click
+from pytz import utc
+from flask import current_app
+from flask.cli import with_appcontext
+from models import db
+from importer import import_file, InvalidImport
+from generator import generate
+from show_stats import refresh_show_stats, check_show_stats
+from geo import load_cities
+from template_cache import load_templates, clear_templates
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.command('init-db')
+@with_appcontext
+def init_db():
+  # creates any missing tables on a fresh database; existing databases are
+  # upgraded with `flask db upgrade` instead. The primary only, replicas
+  # follow it through replication
+  db.create_all(bind=None)
+  click.echo('Initialized the database.')
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--skip-invalid', is_flag=True, help='Drop rows that fail validation instead of aborting.')
+@with_appcontext
+def import_data(kind, path, skip_invalid):
+  # bulk loads a CSV or JSONL file (the /api/export/<kind> format) with COPY;
+  # import venues and artists before the shows that reference them
+  try:
+    result = import_file(kind, path, skip_invalid=skip_invalid)
+  except InvalidImport as error:
+    for row in error.rows:
+      click.echo('  line %d: %s' % (row.line, dict(row._mapping)), err=True)
+    raise click.ClickException('%s, nothing was imported.' % error)
+  click.echo('Imported %s from %s: %d rows, %d inserted, %d updated, %d skipped (%d invalid).' % (
+    kind, path, result['rows'], result['inserted'], result['updated'], result['skipped'], result['invalid']))
+
+@click.command('generate')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=3000, show_default=True)
+@click.option('--shows', default=20000, show_default=True)
+@click.option('--seed', default=0, show_default=True, help='Same seed, same rows.')
+@click.option('--workers', default=4, show_default=True, help='Parallel COPY processes.')
+@click.option('--batch-size', default=50000, show_default=True, help='Rows per COPY.')
+@click.option('--anchor', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Date show times are spread around (default: today, UTC).')
+@click.option('--reset', is_flag=True, help='Truncate Venue, Artist and Shows first.')
+@with_appcontext
+def generate_data(venues, artists, shows, seed, workers, batch_size, anchor, reset):
+  # fills the tables with synthetic data for scale testing, see generator.py
+  if anchor is not None:
+    anchor = anchor.replace(tzinfo=utc)
+  with click.progressbar(length=venues + artists + shows, label='Generating') as bar:
+    generate(venues, artists, shows, seed=seed, workers=workers, batch_size=batch_size,
+             anchor=anchor, reset=reset, progress=lambda kind, count: bar.update(count))
+  click.echo('Generated %d venues, %d artists and %d shows (seed %d).' % (venues, artists, shows, seed))
+
+@click.command('refresh-stats')
+@click.option('--every', type=int, help='Keep refreshing, every this many seconds.')
+@with_appcontext
+def refresh_stats(every):
+  # rolls the upcoming / past show counters forward to now; run it on a
+  # schedule (cron, or --every) so shows move to past as their start passes
+  while True:
+    started = time.monotonic()
+    moved = refresh_show_stats()
+    click.echo('Moved %d show(s) from upcoming to past in %.1f ms.' % (moved, (time.monotonic() - started) * 1000.0))
+    if not every:
+      break
+    time.sleep(max(every - (time.monotonic() - started), 0))
+
+@click.command('check-stats')
+@with_appcontext
+def check_stats():
+  # recounts every venue's and artist's shows and repairs counters that drifted
+  repaired = check_show_stats()
+  for table, ids in repaired.items():
+    if ids:
+      click.echo('%s: repaired %d row(s): %s' % (table, len(ids), ', '.join(str(id) for id in ids[:50])))
+  click.echo('Checked the show counters, %d row(s) repaired.' % sum(len(ids) for ids in repaired.values()))
+
+@click.command('load-cities')
+@click.argument('path', required=False, type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def load_cities_command(path):
+  # loads city coordinates (default: cities.csv next to app.py) and locates
+  # the venues in those cities, for /venues/near
+  path = path or os.path.join(current_app.root_path, 'cities.csv')
+  cities, venues = load_cities(path)
+  click.echo('Loaded %d cities from %s, located %d venues.' % (cities, path, venues))
+
+@click.command('compile-templates')
+@click.option('--clean', is_flag=True, help='Remove the compiled templates first.')
+@with_appcontext
+def compile_templates(clean):
+  # compiles every template into TEMPLATE_CACHE_DIR, run it at build time so
+  # no worker compiles one on its first requests
+  if not current_app.jinja_env.bytecode_cache:
+    raise click.ClickException('TEMPLATE_CACHE_DIR is not set, there is nowhere to keep compiled templates.')
+  if clean:
+    click.echo('Removed %d compiled template(s).' % clear_templates(current_app))
+  count, elapsed = load_templates(current_app)
+  click.echo('Compiled %d templates into %s in %.1f ms.' % (
+    count, current_app.config['TEMPLATE_CACHE_DIR'], elapsed))
+
+def register_commands(app):
+  app.cli.add_command(init_db)
+  app.cli.add_command(import_data)
+  app.cli.add_command(generate_data)
+  app.cli.add_command(refresh_stats)
+  app.cli.add_command(check_stats)
+  app.cli.add_command(load_cities_command)
+  app.cli.add_command(compile_templates)
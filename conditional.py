@@ -0,0 +1,124 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import sys
+import hashlib
+import os
+from functools import wraps
+from flask import current_app, g, request, make_response
+from models import db, Venue, Artist, Shows, table_deletions
+from queries import page_cacheable
+from replicas import replicas
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+# A page's validator is one query of a few index lookups: the latest
+# updated_at of every table the page is drawn from, the last delete from
+# those tables (table_deletions, see models.py), and the start of the next
+# upcoming show, since the upcoming / past split moves with the clock even
+# when nothing is written. A detail page reads its own row and the latest
+# updated_at of its shows through (venue_id, updated_at) / (artist_id,
+# updated_at), never the whole show history: adding or deleting a show
+# changes the row's show counters, which touches its updated_at, and
+# renaming the artist or venue on the other side touches the shows (the
+# touch_booked_shows trigger). The ETag hashes those values with the URL and
+# the templates, so a deploy that changes the markup changes every ETag too.
+# A matching If-None-Match is answered with an empty 304 before the view
+# runs. Otherwise the same values, without the URL, are left on g as the
+# page's version: the page cache (cache.py) only serves a page rendered for
+# the current version, so a page cached before a write never goes out under
+# the ETag of a newer one. /venues/1 and /async/venues/1 share their version,
+# and their cache entry.
+
+def latest(model, *criteria):
+  return db.select(db.func.max(model.updated_at)).where(*criteria).scalar_subquery()
+
+def deleted(model):
+  return db.select(table_deletions.c.deleted_at)\
+    .where(table_deletions.c.table_name == model.__tablename__).scalar_subquery()
+
+def next_start(*criteria):
+  return db.select(db.func.min(Shows.start_time))\
+    .where(Shows.start_time >= db.func.now(), *criteria).scalar_subquery()
+
+# each returns (modification times, other values) for one page
+def venues_state():
+  return [latest(Venue), latest(Shows), deleted(Venue)], [next_start()]
+
+def artists_state():
+  return [latest(Artist), deleted(Artist)], []
+
+def shows_state():
+  return [latest(Shows), latest(Venue), latest(Artist), deleted(Shows)], []
+
+def venue_state(venue_id):
+  return [latest(Venue, Venue.id == venue_id), latest(Shows, Shows.venue_id == venue_id)], \
+         [next_start(Shows.venue_id == venue_id)]
+
+def artist_state(artist_id):
+  return [latest(Artist, Artist.id == artist_id), latest(Shows, Shows.artist_id == artist_id)], \
+         [next_start(Shows.artist_id == artist_id)]
+
+def template_version(app):
+  # computed once per process; identical in every worker of a deploy
+  digest = hashlib.sha1()
+  for root, dirs, files in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+    for name in sorted(files):
+      with open(os.path.join(root, name), 'rb') as handle:
+        digest.update(handle.read())
+  return digest.hexdigest()
+
+def page_digest(*parts):
+  if 'template_version' not in current_app.extensions:
+    current_app.extensions['template_version'] = template_version(current_app)
+  raw = repr((current_app.extensions['template_version'],) + parts)
+  return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def page_etag(values):
+  return page_digest(request.full_path, values)
+
+def page_version():
+  # the version the page is cached under, None when it must not be cached:
+  # a one-off page, a client reading its own writes on the primary (the
+  # cached copy may come from a replica behind them), or a page read from
+  # a replica too far behind to share
+  if not page_cacheable() or not replicas.fresh():
+    return None
+  return g.get('page_version')
+
+def conditional(state):
+  """Adds ETag / Last-Modified to a GET view and answers If-None-Match."""
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      # pages carrying a flashed message are one-offs, leave them alone
+      if request.method not in ('GET', 'HEAD') or not page_cacheable():
+        return view(*args, **kwargs)
+      modified, others = state(*args, **kwargs)
+      try:
+        values = tuple(db.session.execute(db.select(*(modified + others))).one())
+      except:
+        db.session.rollback()
+        print(sys.exc_info())
+        return view(*args, **kwargs)
+      etag = page_etag(values)
+      g.page_version = page_digest(values)
+      stamps = [value for value in values[:len(modified)] if value is not None]
+      if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+      else:
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+          return response
+      response.set_etag(etag, weak=True)
+      if stamps:
+        response.last_modified = max(stamps)
+      # caches may keep the page but have to revalidate it on every use
+      response.cache_control.public = True
+      response.cache_control.no_cache = True
+      return response
+    return wrapper
+  return decorator
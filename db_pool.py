@@ -0,0 +1,137 @@
+"""Connection pool instrumentation and per-engine database settings.
+
+TimedQueuePool is a QueuePool that records how long each checkout waited for
+a free connection, so pool_size / max_overflow can be sized from real numbers
+rather than guessed. The numbers are kept in the module level ``pool_stats``
+because SQLAlchemy recreates the pool object after a dispose or invalidation.
+"""
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # called with (waited, timed_out) after every checkout, see metrics.py
+        self.on_record = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def record(self, waited, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        if self.on_record is not None:
+            self.on_record(waited, timed_out)
+
+    def snapshot(self, pool=None):
+        with self._lock:
+            data = {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_total_ms': round(self.wait_total * 1000.0, 3),
+                'wait_max_ms': round(self.wait_max * 1000.0, 3),
+                'wait_mean_ms': round(self.wait_total * 1000.0 / self.checkouts, 3) if self.checkouts else 0.0,
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                'size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+            })
+        return data
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super(TimedQueuePool, self)._do_get()
+        except exc.TimeoutError:
+            pool_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - started)
+        return conn
+
+
+def engine_options(config):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings in config.py."""
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    # PgBouncer in transaction mode rejects the startup 'options' parameter,
+    # the timeout is set per transaction by configure_engine() instead
+    if config['DB_STATEMENT_TIMEOUT'] and not config['DB_PGBOUNCER']:
+        options['connect_args'] = {
+            'options': '-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT'],
+        }
+    return options
+
+
+def replica_binds(urls, connect_timeout):
+    """SQLALCHEMY_BINDS for the comma separated DATABASE_REPLICA_URLS."""
+    binds = {}
+    for i, url in enumerate(url for url in urls.split(',') if url):
+        url = make_url(url)
+        if connect_timeout and 'connect_timeout' not in url.query:
+            # the lag check runs on the request path: a replica that stopped
+            # answering fails it in seconds instead of stalling the request
+            url = url.update_query_dict({'connect_timeout': str(connect_timeout)})
+        binds['replica_%d' % i] = url.render_as_string(hide_password=False)
+    return binds
+
+
+def async_engine_options(config):
+    """The same pool and timeout settings for the asyncpg engine in async_db.py."""
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if config['DB_PGBOUNCER']:
+        # prepared statements do not survive PgBouncer's transaction pooling;
+        # the statement timeout is set per transaction by configure_engine()
+        options['connect_args'] = {'statement_cache_size': 0, 'prepared_statement_cache_size': 0}
+    elif config['DB_STATEMENT_TIMEOUT']:
+        options['connect_args'] = {
+            'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT'])},
+        }
+    return options
+
+
+def configure_engine(engine, config):
+    """Attach the per-transaction settings needed behind PgBouncer."""
+    timeout = config['DB_STATEMENT_TIMEOUT']
+    if config['DB_PGBOUNCER'] and timeout:
+        # a session level SET would leak to whichever client PgBouncer hands
+        # the server connection to next, SET LOCAL ends with the transaction
+        @event.listens_for(engine, 'begin')
+        def set_statement_timeout(conn):
+            conn.exec_driver_sql('SET LOCAL statement_timeout = %d' % timeout)
@@ -0,0 +1,69 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from datetime import datetime
+from models import db, Venue, Artist, Shows
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+# Exports select plain columns (no ORM instances, so nothing piles up in the
+# identity map) through a server-side cursor, and are written out in chunks
+# of EXPORT_BATCH_SIZE rows while the cursor is read.
+EXPORTS = {
+  'shows': (Shows, ['id', 'artist_id', 'venue_id', 'start_time', 'end_time']),
+  'artists': (Artist, ['id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+                       'website_link', 'facebook_link', 'seeking_venue', 'seeking_description']),
+  'venues': (Venue, ['id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+                     'website_link', 'facebook_link', 'seeking_talent', 'seeking_description']),
+}
+
+def export_rows(model, names, batch_size):
+  columns = [getattr(model, name) for name in names]
+  return db.session.query(*columns).order_by(model.id).yield_per(batch_size)
+
+def dump_ndjson(record):
+  if orjson is not None:
+    return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+  return (json.dumps(record, default=lambda value: value.isoformat(), separators=(',', ':')) + '\n').encode('utf-8')
+
+def ndjson_chunks(rows, names, batch_size):
+  chunk = []
+  for row in rows:
+    chunk.append(dump_ndjson(dict(zip(names, row))))
+    if len(chunk) >= batch_size:
+      yield b''.join(chunk)
+      chunk = []
+  if chunk:
+    yield b''.join(chunk)
+
+def csv_value(value):
+  if isinstance(value, list):
+    return '|'.join(value)
+  if isinstance(value, datetime):
+    return value.isoformat()
+  return value
+
+def csv_chunks(rows, names, batch_size):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow(names)
+  pending = 0
+  for row in rows:
+    writer.writerow([csv_value(value) for value in row])
+    pending += 1
+    if pending >= batch_size:
+      yield buffer.getvalue().encode('utf-8')
+      buffer.seek(0)
+      buffer.truncate()
+      pending = 0
+  yield buffer.getvalue().encode('utf-8')
@@ -5,14 +5,23 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    # smoke run of every route against the fyyur_bench database
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python benchmarks/routes_bench.py --scale tiny --requests 20 --writes", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
 
+def bench(scale="small", baseline=None):
+    # fab bench:scale=medium,baseline=bench.json
+    command = "python benchmarks/routes_bench.py --scale {} --output bench-{}.json".format(scale, scale)
+    if baseline:
+        command += " --baseline {}".format(baseline)
+    local(command)
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -0,0 +1,48 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from functools import lru_cache
+import dateutil.parser
+import babel
+import babel.dates
+from pytz import utc
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+PATTERNS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+# Parsing the pattern and the locale is most of babel's cost per call, and a
+# page of show tiles uses the same pair over and over.
+@lru_cache(maxsize=64)
+def compiled_pattern(format, locale):
+  return babel.dates.parse_pattern(PATTERNS.get(format, format)), babel.Locale.parse(locale)
+
+def to_datetime(value):
+  if isinstance(value, datetime):
+    return value
+  # ISO 8601 covers everything the controllers and the sample data produce;
+  # anything else still goes through the (much slower) dateutil parser
+  try:
+    return datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+  except ValueError:
+    return dateutil.parser.parse(value)
+
+def format_datetime(value, format='medium', locale='en'):
+  date = to_datetime(value)
+  if date.tzinfo is None:
+    date = date.replace(tzinfo=utc)
+  if format in ('long', 'short'):
+    # babel's own named formats are locale data, not a pattern
+    return babel.dates.format_datetime(date, format, locale=locale)
+  pattern, locale = compiled_pattern(format, locale)
+  return pattern.apply(date, locale)
+
+def register_filters(app):
+  app.jinja_env.filters['datetime'] = format_datetime
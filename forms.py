@@ -2,8 +2,8 @@ from datetime import datetime
 
 import enum
 from flask_wtf import FlaskForm as Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, InputRequired
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, InputRequired, Optional, NumberRange
 
 class States(enum.Enum):
     def __str__(self):
@@ -108,6 +108,12 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration = IntegerField(
+        # minutes
+        'duration',
+        validators=[Optional(), NumberRange(min=15, max=1440)],
+        default=180
+    )
 
 class VenueForm(Form):
     name = StringField(
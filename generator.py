@@ -0,0 +1,165 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+from multiprocessing import Pool
+import psycopg2
+from pytz import utc
+from forms import Genres, States
+from models import db
+from show_stats import check_show_stats
+from bookings import settle_bookings
+
+#----------------------------------------------------------------------------#
+# Generator.
+#----------------------------------------------------------------------------#
+
+# Synthetic Venue / Artist / Shows rows for scale testing. Every batch draws
+# from its own random.Random seeded with (seed, table, batch number) and owns a
+# fixed id range, so the output is identical for a given seed no matter how
+# many worker processes share the batches or in which order they finish.
+
+# (city, state) pairs in popularity order; draws follow a Zipf-like curve so
+# a few metros hold most of the venues, like real listings
+CITIES = [
+  ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('San Francisco', 'CA'),
+  ('Austin', 'TX'), ('Nashville', 'TN'), ('Seattle', 'WA'), ('New Orleans', 'LA'),
+  ('Atlanta', 'GA'), ('Boston', 'MA'), ('Denver', 'CO'), ('Philadelphia', 'PA'),
+  ('Portland', 'OR'), ('Miami', 'FL'), ('Detroit', 'MI'), ('Minneapolis', 'MN'),
+  ('Houston', 'TX'), ('Las Vegas', 'NV'), ('Memphis', 'TN'), ('Oakland', 'CA'),
+  ('Brooklyn', 'NY'), ('Baltimore', 'MD'), ('Kansas City', 'MO'), ('Cleveland', 'OH'),
+  ('Salt Lake City', 'UT'), ('Richmond', 'VA'), ('Providence', 'RI'), ('Burlington', 'VT'),
+  ('Boise', 'ID'), ('Anchorage', 'AK'),
+]
+CITY_WEIGHTS = list(accumulate(1.0 / (rank ** 1.1) for rank in range(1, len(CITIES) + 1)))
+
+VENUE_WORDS = (['The Musical', 'Park Square', 'Dueling', 'Velvet', 'Electric', 'Blue Note', 'Golden', 'Rusty'],
+               ['Hop', 'Hall', 'Lounge', 'Pianos Bar', 'Room', 'Theatre', 'Garden', 'Warehouse'])
+ARTIST_WORDS = (['Guns N', 'The Wild', 'Matt', 'Midnight', 'Neon', 'Silver', 'Lazy', 'Broken'],
+                ['Petals', 'Sax Band', 'Quevedo', 'Owls', 'Collective', 'Trio', 'Quartet', 'Radio'])
+GENRES = [genre.value for genre in Genres]
+STATES = set(state.value for state in States)
+
+assert all(state in STATES for _, state in CITIES)
+
+TABLES = {
+  'venues': ('Venue', ['id', 'name', 'city', 'state', 'address', 'genres', 'seeking_talent']),
+  'artists': ('Artist', ['id', 'name', 'city', 'state', 'genres', 'seeking_venue']),
+  'shows': ('Shows', ['id', 'artist_id', 'venue_id', 'start_time', 'end_time', 'double_booked']),
+}
+
+def zipf_index(rng, size, skew=1.1):
+  # inverse of a continuous power law, rank 0 is the most popular
+  return min(size - 1, int(size ** rng.random() ** skew) - 1)
+
+def genre_literal(rng):
+  genres = rng.sample(GENRES, rng.randint(1, 3))
+  return '{' + ','.join('"%s"' % genre for genre in genres) + '}'
+
+def venue_row(rng, row_id, context):
+  city, state = rng.choices(CITIES, cum_weights=CITY_WEIGHTS)[0]
+  first, second = VENUE_WORDS
+  return [row_id, '%s %s %d' % (rng.choice(first), rng.choice(second), row_id), city, state,
+          '%d %s Street' % (rng.randint(1, 9999), rng.choice(second)), genre_literal(rng),
+          rng.random() < 0.3]
+
+def artist_row(rng, row_id, context):
+  city, state = rng.choices(CITIES, cum_weights=CITY_WEIGHTS)[0]
+  first, second = ARTIST_WORDS
+  return [row_id, '%s %s %d' % (rng.choice(first), rng.choice(second), row_id), city, state,
+          genre_literal(rng), rng.random() < 0.4]
+
+def show_row(rng, row_id, context):
+  # popular venues and artists get most of the bookings; start times spread
+  # over the past and future windows, in the evening
+  venue_first, venue_count, artist_first, artist_count, anchor, past_days, future_days = context
+  day = rng.randint(-past_days, future_days)
+  start_time = anchor + timedelta(days=day, hours=rng.randint(18, 23), minutes=rng.choice((0, 30)))
+  end_time = start_time + timedelta(minutes=rng.choice((120, 150, 180)))
+  # copied in exempt from the booking constraints, settle_bookings() clears
+  # the flag on every show that fits
+  return [row_id, artist_first + zipf_index(rng, artist_count), venue_first + zipf_index(rng, venue_count),
+          start_time.isoformat(), end_time.isoformat(), True]
+
+ROW_BUILDERS = {'venues': venue_row, 'artists': artist_row, 'shows': show_row}
+
+def copy_batch(job):
+  # runs in a worker process: build one batch as CSV and COPY it in
+  dsn, kind, seed, batch, first_id, count, context = job
+  rng = random.Random('%s:%s:%d' % (seed, kind, batch))
+  table, columns = TABLES[kind]
+  build = ROW_BUILDERS[kind]
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  for row_id in range(first_id, first_id + count):
+    writer.writerow(build(rng, row_id, context))
+  buffer.seek(0)
+  conn = psycopg2.connect(dsn)
+  try:
+    with conn, conn.cursor() as cursor:
+      # the counters are recounted once at the end, see generate()
+      cursor.execute("SET LOCAL fyyur.count_shows = 'off'")
+      cursor.copy_expert('COPY "%s" (%s) FROM STDIN WITH (FORMAT csv)' % (table, ', '.join(columns)), buffer)
+  finally:
+    conn.close()
+  return count
+
+def next_id(table):
+  return db.session.execute(db.text('SELECT coalesce(max(id), 0) + 1 FROM "%s"' % table)).scalar()
+
+def generate_table(pool, dsn, kind, total, seed, batch_size, context=None, progress=None):
+  table, _ = TABLES[kind]
+  first_id = next_id(table)
+  db.session.rollback()
+  jobs = [(dsn, kind, seed, batch, first_id + batch * batch_size,
+           min(batch_size, total - batch * batch_size), context)
+          for batch in range((total + batch_size - 1) // batch_size)]
+  for count in pool.imap_unordered(copy_batch, jobs):
+    if progress:
+      progress(kind, count)
+  # the serial sequence never saw the explicit ids
+  db.session.execute(db.text("SELECT setval(pg_get_serial_sequence('\"%s\"', 'id'), "
+                             "coalesce((SELECT max(id) FROM \"%s\"), 1))" % (table, table)))
+  db.session.commit()
+  return first_id
+
+def generate(venues, artists, shows, seed=0, workers=4, batch_size=50000, anchor=None,
+             past_days=730, future_days=365, reset=False, progress=None):
+  """Fills Venue, Artist and Shows with synthetic rows, deterministic per seed."""
+  if anchor is None:
+    anchor = datetime.now(utc).replace(hour=0, minute=0, second=0, microsecond=0)
+  dsn = db.engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+  if reset:
+    db.session.execute(db.text('TRUNCATE "Shows", "Artist", "Venue" RESTART IDENTITY CASCADE'))
+    db.session.commit()
+  # the workers connect on their own, do not fork with pooled connections open
+  db.session.close()
+  db.engine.dispose()
+
+  with Pool(processes=workers) as pool:
+    venue_first = generate_table(pool, dsn, 'venues', venues, seed, batch_size, progress=progress)
+    artist_first = generate_table(pool, dsn, 'artists', artists, seed, batch_size, progress=progress)
+    if shows:
+      if not venues or not artists:
+        # booking into what is already there, assumed to be densely numbered
+        venue_first, venues = db.session.execute(db.text('SELECT min(id), count(*) FROM "Venue"')).fetchone()
+        artist_first, artists = db.session.execute(db.text('SELECT min(id), count(*) FROM "Artist"')).fetchone()
+        db.session.rollback()
+        if not venues or not artists:
+          raise ValueError('shows need existing venues and artists to book')
+      context = (venue_first, venues, artist_first, artists, anchor, past_days, future_days)
+      generate_table(pool, dsn, 'shows', shows, seed, batch_size, context=context, progress=progress)
+
+  if shows:
+    settle_bookings()
+  # one recount instead of the trigger's per-statement updates, which the
+  # parallel workers would contend on
+  check_show_stats()
+  for table in ('Venue', 'Artist', 'Shows'):
+    db.session.execute(db.text('ANALYZE "%s"' % table))
+  db.session.commit()
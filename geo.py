@@ -0,0 +1,125 @@
+"""Venue locations and the geohash cells behind /venues/near.
+
+Venues get their latitude / longitude from the city_locations table, loaded
+from cities.csv by ``flask load-cities`` (no geocoding service involved): the
+locate_venue trigger (see models.py) copies a city's coordinates and geohash
+onto every venue inserted or moved there.
+
+A geohash is a base-32 string naming a cell of a lat/lon grid, each extra
+character splitting the cell 32 ways, so every venue in a cell shares the
+cell's prefix and a btree on "Venue".geohash finds them with a LIKE 'prefix%'
+range scan. ``cover()`` picks the smallest cells at least as large as the
+search radius and returns the one holding the centre plus its eight
+neighbours, which together contain the whole circle; the exact distance test
+only runs on the venues in those nine cells.
+"""
+import csv
+import math
+
+from sqlalchemy import text
+
+from models import db
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# stored on each venue; ~5 m cells, far finer than any search radius
+PRECISION = 9
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        # bits alternate between longitude and latitude, longitude first
+        if even:
+            span, coordinate = lon_range, longitude
+        else:
+            span, coordinate = lat_range, latitude
+        middle = (span[0] + span[1]) / 2.0
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            span[0] = middle
+        else:
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(latitude, longitude) degrees covered by one cell."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def cover_precision(latitude, radius_km):
+    # the finest cells still at least radius_km high and wide, measuring the
+    # width at the circle's edge nearest the pole, where cells are narrowest
+    edge = min(abs(latitude) + radius_km / KM_PER_DEGREE, 89.0)
+    shrink = math.cos(math.radians(edge))
+    precision = 1
+    while precision < PRECISION:
+        lat_degrees, lon_degrees = cell_size(precision + 1)
+        if min(lat_degrees * KM_PER_DEGREE, lon_degrees * KM_PER_DEGREE * shrink) < radius_km:
+            break
+        precision += 1
+    return precision
+
+
+def cover(latitude, longitude, radius_km):
+    """Geohash prefixes whose cells together contain the whole circle."""
+    precision = cover_precision(latitude, radius_km)
+    lat_degrees, lon_degrees = cell_size(precision)
+    cells = set()
+    for lat_step in (-1, 0, 1):
+        for lon_step in (-1, 0, 1):
+            lat = min(max(latitude + lat_step * lat_degrees, -90.0), 90.0)
+            lon = (longitude + lon_step * lon_degrees + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def read_cities(path):
+    """(city, state, latitude, longitude, geohash) rows of a cities CSV."""
+    with open(path, newline='', encoding='utf-8') as handle:
+        for row in csv.DictReader(handle):
+            latitude, longitude = float(row['latitude']), float(row['longitude'])
+            yield row['city'], row['state'], latitude, longitude, encode(latitude, longitude)
+
+
+UPSERT_CITY = text(
+    'INSERT INTO city_locations (city, state, latitude, longitude, geohash) '
+    'VALUES (:city, :state, :latitude, :longitude, :geohash) '
+    'ON CONFLICT (city, state) DO UPDATE SET latitude = EXCLUDED.latitude, '
+    'longitude = EXCLUDED.longitude, geohash = EXCLUDED.geohash')
+
+# venues inserted before their city was known, or whose city moved
+RELOCATE_VENUES = text(
+    'UPDATE "Venue" v SET latitude = c.latitude, longitude = c.longitude, geohash = c.geohash '
+    'FROM city_locations c WHERE lower(c.city) = lower(v.city) AND c.state = v.state '
+    'AND v.geohash IS DISTINCT FROM c.geohash')
+
+
+def load_cities(path):
+    """Load a cities CSV and locate the venues in those cities; returns
+    (cities loaded, venues located)."""
+    rows = [dict(zip(('city', 'state', 'latitude', 'longitude', 'geohash'), row))
+            for row in read_cities(path)]
+    with db.engine.begin() as conn:
+        if rows:
+            conn.execute(UPSERT_CITY, rows)
+        located = conn.execute(RELOCATE_VENUES).rowcount
+    return len(rows), located
@@ -0,0 +1,61 @@
+# gunicorn -c gunicorn.conf.py app:app
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('BIND', '0.0.0.0:%s' % os.environ.get('PORT', '5000'))
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# Import app.py once in the master and fork the workers from it, so the
+# modules, templates and config are shared copy-on-write instead of being
+# rebuilt by every worker.
+preload_app = True
+
+# Every worker writes its metrics to files in this directory and /metrics
+# merges them (see metrics.py). It has to be set before the app is imported,
+# and emptied so numbers from a previous run are not added in.
+prometheus_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'fyyur-prometheus'))
+shutil.rmtree(prometheus_dir, ignore_errors=True)
+os.makedirs(prometheus_dir)
+
+
+def when_ready(server):
+    # load every template in the master (from TEMPLATE_CACHE_DIR when
+    # `flask compile-templates` ran) so the workers fork with them in memory
+    from app import app
+    from template_cache import load_templates
+    load_templates(app)
+
+
+def pre_fork(server, worker):
+    # move everything imported so far out of the collector's reach, otherwise
+    # the first collection in each worker touches (and copies) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # the master never opens a connection, but make sure no pooled
+    # connection is ever shared with the parent
+    from app import app
+    from models import db
+    from replicas import replicas
+    from slow_queries import slow_query_log
+    with app.app_context():
+        for engine in [db.engine] + replicas.engines:
+            engine.dispose(close=False)
+    # a log file handle of the worker's own, not the master's
+    slow_query_log.reopen()
+    # shows move from upcoming to past as they start, see show_stats.py
+    if app.config['SHOW_STATS_REFRESH_SECONDS']:
+        from show_stats import refresh_periodically
+        refresh_periodically(app, app.config['SHOW_STATS_REFRESH_SECONDS'])
+
+
+def child_exit(server, worker):
+    # drop the live gauges (in-flight requests, checked out connections) of a
+    # worker that is gone; its counters and histograms are kept
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
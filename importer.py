@@ -0,0 +1,243 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import json
+import tempfile
+from flask import current_app
+from sqlalchemy.dialects import postgresql
+from forms import Genres, States
+from models import db
+from export import EXPORTS
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+#----------------------------------------------------------------------------#
+# Import.
+#----------------------------------------------------------------------------#
+
+# Files are loaded in four set-based steps inside one transaction:
+#   1. the input (CSV or JSONL, same columns as /api/export/<kind>) is
+#      normalized into a CSV spool file, numbering every row,
+#   2. the spool is COPY'd into a temporary staging table,
+#   3. the staging table is validated with a handful of anti-joins
+#      (states, genres, required columns, show foreign keys and bookings),
+#   4. the valid rows are upserted into the real table.
+# Nothing is done per row against the database, so a 500k show catalog is a
+# single COPY and a single INSERT ... SELECT.
+
+GENRE_SEPARATOR = '|'
+SPOOL_SIZE = 64 * 1024 * 1024
+REPORTED_ERRORS = 20
+
+REQUIRED = {
+  'venues': ['name'],
+  'artists': ['name'],
+  'shows': ['artist_id', 'venue_id', 'start_time'],
+}
+
+class InvalidImport(Exception):
+  """Raised when the input does not validate; nothing has been written."""
+
+  def __init__(self, message, rows=()):
+    super().__init__(message)
+    self.rows = list(rows)
+
+def read_records(path):
+  # yields one dict per input row, in file order
+  if path.endswith(('.jsonl', '.ndjson')):
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(path, 'rb') as handle:
+      for line in handle:
+        if line.strip():
+          yield loads(line)
+  else:
+    with open(path, newline='', encoding='utf-8') as handle:
+      for record in csv.DictReader(handle):
+        yield record
+
+def spool_value(value):
+  if value is None:
+    return ''
+  if isinstance(value, (list, tuple)):
+    return GENRE_SEPARATOR.join(value)
+  return value
+
+def spool(records, names):
+  # normalizes the records into a CSV file COPY can read, prefixed by a line
+  # number so validation errors can point back at the input
+  buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode='w+', newline='', encoding='utf-8')
+  writer = csv.writer(buffer)
+  count = 0
+  for count, record in enumerate(records, 1):
+    writer.writerow([count] + [spool_value(record.get(name)) for name in names])
+  buffer.seek(0)
+  return buffer, count
+
+def staging_type(model, name):
+  if name == 'genres':
+    return 'text'
+  return getattr(model, name).type.compile(dialect=postgresql.dialect())
+
+def create_staging(conn, kind):
+  model, names = EXPORTS[kind]
+  columns = ', '.join('"%s" %s' % (name, staging_type(model, name)) for name in names)
+  conn.exec_driver_sql('CREATE TEMPORARY TABLE import_rows (line integer, %s) ON COMMIT DROP' % columns)
+
+def copy_into_staging(conn, buffer, names):
+  cursor = conn.connection.cursor()
+  try:
+    cursor.copy_expert('COPY import_rows (line, %s) FROM STDIN WITH (FORMAT csv)'
+                       % ', '.join('"%s"' % name for name in names), buffer)
+  finally:
+    cursor.close()
+
+# an existing show holds the venue / artist at that time; the show itself
+# (same id) and the exact duplicates upsert skips are not clashes. {booked}
+# picks the constraint's shows or the double-booked ones it leaves out, so
+# each EXISTS matches one partial index
+BOOKING_CLASH = ('EXISTS (SELECT 1 FROM "Shows" s WHERE s.{key} = import_rows.{key} '
+                 'AND s.start_time IS NOT NULL AND {booked} '
+                 'AND tstzrange(s.start_time, s.end_time) && tstzrange(import_rows.start_time, import_rows.end_time) '
+                 'AND s.id IS DISTINCT FROM import_rows.id '
+                 'AND NOT (s.artist_id = import_rows.artist_id AND s.venue_id = import_rows.venue_id '
+                 'AND s.start_time = import_rows.start_time))')
+
+# another row of the same file holds the venue / artist at that time; the
+# same show listed twice (same id, or the duplicates upsert folds into the
+# last one) is not a clash, nor is a row updating a double-booked show
+STAGED_CLASH = ('EXISTS (SELECT 1 FROM import_rows o WHERE o.{key} = import_rows.{key} '
+                'AND o.line <> import_rows.line AND o.start_time IS NOT NULL '
+                'AND tstzrange(o.start_time, o.end_time) && tstzrange(import_rows.start_time, import_rows.end_time) '
+                'AND NOT coalesce(o.id = import_rows.id, false) '
+                'AND NOT (o.artist_id = import_rows.artist_id AND o.venue_id = import_rows.venue_id '
+                'AND o.start_time = import_rows.start_time) '
+                'AND NOT EXISTS (SELECT 1 FROM "Shows" d WHERE d.id = o.id AND d.double_booked))')
+
+def invalid_rows_predicate(kind, names):
+  checks = ["%s IS NULL" % name for name in REQUIRED[kind]]
+  if 'name' in names:
+    checks.append("btrim(name) = ''")
+  if 'state' in names:
+    checks.append('(state IS NOT NULL AND state <> ALL(CAST(:states AS text[])))')
+  if 'genres' in names:
+    checks.append("NOT (coalesce(string_to_array(genres, '%s'), '{}') <@ CAST(:genres AS text[]))"
+                  % GENRE_SEPARATOR)
+  if kind == 'shows':
+    checks.append('NOT EXISTS (SELECT 1 FROM "Artist" a WHERE a.id = import_rows.artist_id)')
+    checks.append('NOT EXISTS (SELECT 1 FROM "Venue" v WHERE v.id = import_rows.venue_id)')
+    checks.append('end_time <= start_time')
+    # one EXISTS per exclusion constraint, against the shows it covers, the
+    # double-booked shows it does not and the rest of the file, each an index
+    # probe; shows already marked double_booked stay exempt when updated by id
+    clashes = [BOOKING_CLASH.format(key=key, booked=booked) for key in ('venue_id', 'artist_id')
+               for booked in ('NOT s.double_booked', 's.double_booked')]
+    clashes += [STAGED_CLASH.format(key=key) for key in ('venue_id', 'artist_id')]
+    checks.extend('(%s AND NOT EXISTS (SELECT 1 FROM "Shows" d WHERE d.id = import_rows.id AND d.double_booked))'
+                  % clash for clash in clashes)
+  return ' OR '.join(checks)
+
+def fill_defaults(conn, kind):
+  # files exported before shows had an end time, or written by hand
+  if kind == 'shows':
+    conn.execute(db.text('UPDATE import_rows SET end_time = start_time + make_interval(mins => :minutes) '
+                         'WHERE end_time IS NULL'), {'minutes': current_app.config['SHOW_DEFAULT_MINUTES']})
+
+def index_staging(conn, kind):
+  # the staged rows are checked against each other, one index probe per row
+  if kind == 'shows':
+    for key in ('venue_id', 'artist_id'):
+      conn.exec_driver_sql('CREATE INDEX ON import_rows USING gist (%s, tstzrange(start_time, end_time)) '
+                           'WHERE start_time IS NOT NULL' % key)
+    conn.exec_driver_sql('ANALYZE import_rows')
+
+def validate(conn, kind, names, skip_invalid):
+  params = {
+    'states': [state.value for state in States],
+    'genres': [genre.value for genre in Genres],
+  }
+  predicate = invalid_rows_predicate(kind, names)
+  invalid = conn.execute(db.text('SELECT count(*) FROM import_rows WHERE %s' % predicate), params).scalar()
+  if invalid and skip_invalid:
+    conn.execute(db.text('DELETE FROM import_rows WHERE %s' % predicate), params)
+  elif invalid:
+    rows = conn.execute(db.text('SELECT * FROM import_rows WHERE %s ORDER BY line LIMIT %d'
+                                % (predicate, REPORTED_ERRORS)), params).fetchall()
+    raise InvalidImport('%d invalid row(s)' % invalid, rows)
+  return invalid
+
+def upsert_sql(kind, names, key, distinct, rows):
+  # key is the conflict target, rows picks the staged rows matched on it
+  model, _ = EXPORTS[kind]
+  columns = [name for name in names if name != 'id' or key == 'id']
+  values = []
+  for name in columns:
+    if name == 'genres':
+      values.append("coalesce(string_to_array(genres, '%s'), '{}')" % GENRE_SEPARATOR)
+    elif name in ('seeking_talent', 'seeking_venue'):
+      values.append('coalesce(%s, false)' % name)
+    else:
+      values.append(name)
+  # the last row wins when a key appears more than once in the file
+  select = 'SELECT DISTINCT ON (%s) %s FROM import_rows WHERE %s ORDER BY %s, line DESC' % (
+    distinct, ', '.join(values), rows, distinct)
+  if key is None:
+    # shows have no natural unique key, skip exact duplicates instead
+    select = ('SELECT * FROM (%s) AS incoming WHERE NOT EXISTS (SELECT 1 FROM "Shows" s '
+              'WHERE s.artist_id = incoming.artist_id AND s.venue_id = incoming.venue_id '
+              'AND s.start_time = incoming.start_time)' % select)
+    conflict = ''
+  else:
+    conflict = 'ON CONFLICT (%s) DO UPDATE SET %s' % (
+      key, ', '.join('%s = EXCLUDED.%s' % (name, name) for name in columns if name != key))
+  return ('WITH upserted AS (INSERT INTO "%s" (%s) %s %s RETURNING (xmax = 0) AS inserted) '
+          'SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted'
+          % (model.__tablename__, ', '.join('"%s"' % name for name in columns), select, conflict))
+
+def upsert(conn, kind, names):
+  model, _ = EXPORTS[kind]
+  # rows carrying an id (e.g. from /api/export) are matched on it, the rest
+  # on the natural key; rows without a phone never conflict and are inserted
+  without_id = 'id IS NULL' if 'id' in names else 'true'
+  statements = []
+  if 'id' in names:
+    statements.append(upsert_sql(kind, names, 'id', 'id', 'id IS NOT NULL'))
+  if kind == 'shows':
+    statements.append(upsert_sql(kind, names, None, 'artist_id, venue_id, start_time', without_id))
+  else:
+    statements.append(upsert_sql(kind, names, 'phone', 'coalesce(phone, line::text)', without_id))
+
+  inserted = updated = 0
+  for sql in statements:
+    added, changed = conn.exec_driver_sql(sql).fetchone()
+    inserted += added
+    updated += changed
+  if 'id' in names:
+    # explicit ids must not collide with the next form submission
+    conn.exec_driver_sql("SELECT setval(pg_get_serial_sequence('\"%s\"', 'id'), "
+                         "coalesce((SELECT max(id) FROM \"%s\"), 1))" % (model.__tablename__, model.__tablename__))
+  return inserted, updated
+
+def import_file(kind, path, skip_invalid=False):
+  """Loads a CSV or JSONL file into Venue, Artist or Shows, returns counts."""
+  model, names = EXPORTS[kind]
+  buffer, total = spool(read_records(path), names)
+  conn = db.session.connection()
+  try:
+    create_staging(conn, kind)
+    copy_into_staging(conn, buffer, names)
+    fill_defaults(conn, kind)
+    index_staging(conn, kind)
+    skipped = validate(conn, kind, names, skip_invalid)
+    inserted, updated = upsert(conn, kind, names)
+    db.session.commit()
+  except:
+    db.session.rollback()
+    raise
+  finally:
+    buffer.close()
+  return {'rows': total, 'inserted': inserted, 'updated': updated,
+          'skipped': total - inserted - updated, 'invalid': skipped}
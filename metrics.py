@@ -0,0 +1,111 @@
+"""Prometheus metrics, served on /metrics.
+
+Under gunicorn every worker keeps its own numbers, so a scrape that landed on
+a single worker would only see that worker's share. gunicorn.conf.py points
+PROMETHEUS_MULTIPROC_DIR at a scratch directory; prometheus_client then keeps
+each process's values in files there and /metrics merges all of them per
+scrape. Without the variable (``python app.py``) the in-process registry is
+served as is.
+
+Ratios are left to the query side, e.g. the page cache hit ratio is
+``rate(fyyur_page_cache_lookups_total{result="hit"}[5m])
+/ rate(fyyur_page_cache_lookups_total[5m])``.
+"""
+import os
+import time
+
+from flask import Response, g, request, template_rendered, before_render_template
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter,
+                               Gauge, Histogram, generate_latest, multiprocess)
+from sqlalchemy import event
+
+from cache import page_cache
+from db_pool import pool_stats
+
+REQUEST_LATENCY = Histogram(
+    'fyyur_request_duration_seconds', 'Request latency by endpoint.',
+    ['endpoint', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+REQUESTS_IN_FLIGHT = Gauge(
+    'fyyur_requests_in_flight', 'Requests currently being handled.',
+    multiprocess_mode='livesum')
+TEMPLATE_RENDER = Histogram(
+    'fyyur_template_render_seconds', 'Template render time.', ['template'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+PAGE_CACHE_LOOKUPS = Counter(
+    'fyyur_page_cache_lookups', 'Rendered page cache lookups.', ['result'])
+DB_POOL_WAIT = Histogram(
+    'fyyur_db_pool_wait_seconds', 'Time spent waiting for a pooled connection.',
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0))
+DB_POOL_TIMEOUTS = Counter(
+    'fyyur_db_pool_timeouts', 'Checkouts that gave up after DB_POOL_TIMEOUT.')
+DB_POOL_CHECKED_OUT = Gauge(
+    'fyyur_db_pool_checked_out', 'Connections currently checked out of the pool.',
+    multiprocess_mode='livesum')
+
+
+def record_page_cache_lookup(hit):
+    PAGE_CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+
+def record_pool_wait(waited, timed_out):
+    if timed_out:
+        DB_POOL_TIMEOUTS.inc()
+    else:
+        DB_POOL_WAIT.observe(waited)
+
+
+def start_request():
+    g.metrics_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def finish_request(response):
+    started = g.get('metrics_started')
+    if started is not None:
+        # unmatched URLs share one label so scanners cannot blow up the series count
+        REQUEST_LATENCY.labels(request.endpoint or 'unmatched', request.method,
+                               str(response.status_code)).observe(time.perf_counter() - started)
+    return response
+
+
+def teardown_request(error=None):
+    if g.pop('metrics_started', None) is not None:
+        REQUESTS_IN_FLIGHT.dec()
+
+
+def start_template(sender, template, context, **extra):
+    g.setdefault('metrics_templates', []).append(time.perf_counter())
+
+
+def finish_template(sender, template, context, **extra):
+    started = g.get('metrics_templates')
+    if started:
+        TEMPLATE_RENDER.labels(template.name or 'string').observe(time.perf_counter() - started.pop())
+
+
+def metrics_view():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def listen_pool(engine):
+    event.listen(engine, 'checkout', lambda *args: DB_POOL_CHECKED_OUT.inc())
+    event.listen(engine, 'checkin', lambda *args: DB_POOL_CHECKED_OUT.dec())
+
+
+def init_metrics(app, *engines):
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(teardown_request)
+    before_render_template.connect(start_template, app, weak=False)
+    template_rendered.connect(finish_template, app, weak=False)
+    page_cache.on_lookup = record_page_cache_lookup
+    pool_stats.on_record = record_pool_wait
+    for engine in engines:
+        listen_pool(engine)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
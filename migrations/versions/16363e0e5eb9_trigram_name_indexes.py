@@ -0,0 +1,34 @@
+"""trigram indexes for artist and venue search
+
+Revision ID: 16363e0e5eb9
+Revises: 8b2249d8b8e6
+Create Date: 2026-10-18 10:03:17.552901
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '16363e0e5eb9'
+down_revision = '8b2249d8b8e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+        op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Venue_name_trgm', table_name='Venue', postgresql_concurrently=True)
+        op.drop_index('ix_Artist_name_trgm', table_name='Artist', postgresql_concurrently=True)
@@ -0,0 +1,135 @@
+"""trigger-maintained show counters on Venue and Artist
+
+Revision ID: 4e1c7b92a6d0
+Revises: c9d9349a3d5e
+Create Date: 2026-10-18 19:40:12.503817
+
+upcoming_shows_count / past_shows_count columns on Venue and Artist,
+splitting shows on show_stats_refreshed.refreshed_at, the one row of a new
+table.
+
+The columns are committed on their own, so ACCESS EXCLUSIVE on Venue /
+Artist is only held for the metadata change. The triggers go in next, then
+the existing shows are counted in id-range batches, each its own short
+transaction.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e1c7b92a6d0'
+down_revision = 'c9d9349a3d5e'
+branch_labels = None
+depends_on = None
+
+COUNTED = [('Venue', 'venue_id'), ('Artist', 'artist_id')]
+
+COUNT_SHOWS_FUNCTION = """
+CREATE OR REPLACE FUNCTION count_shows() RETURNS trigger AS $$
+DECLARE
+  boundary timestamptz;
+  venue_ids integer[];
+  artist_ids integer[];
+  is_upcoming boolean[];
+  deltas integer[];
+BEGIN
+  IF current_setting('fyyur.count_shows', true) = 'off' THEN
+    RETURN NULL;
+  END IF;
+  SELECT refreshed_at INTO boundary FROM show_stats_refreshed FOR SHARE;
+  IF TG_OP = 'INSERT' THEN
+    SELECT array_agg(venue_id), array_agg(artist_id), array_agg(start_time >= boundary), array_agg(1)
+      INTO venue_ids, artist_ids, is_upcoming, deltas FROM new_shows;
+  ELSIF TG_OP = 'DELETE' THEN
+    SELECT array_agg(venue_id), array_agg(artist_id), array_agg(start_time >= boundary), array_agg(-1)
+      INTO venue_ids, artist_ids, is_upcoming, deltas FROM old_shows;
+  ELSE
+    SELECT array_agg(venue_id), array_agg(artist_id), array_agg(start_time >= boundary), array_agg(sign)
+      INTO venue_ids, artist_ids, is_upcoming, deltas
+      FROM (SELECT venue_id, artist_id, start_time, 1 AS sign FROM new_shows
+            UNION ALL SELECT venue_id, artist_id, start_time, -1 FROM old_shows) AS changed;
+  END IF;
+  UPDATE "Venue" v SET upcoming_shows_count = v.upcoming_shows_count + d.upcoming,
+                       past_shows_count = v.past_shows_count + d.past
+    FROM (SELECT id, coalesce(sum(sign) FILTER (WHERE up), 0) AS upcoming,
+                 coalesce(sum(sign) FILTER (WHERE NOT up), 0) AS past
+          FROM unnest(venue_ids, is_upcoming, deltas) AS c(id, up, sign) GROUP BY id) AS d
+    WHERE v.id = d.id AND (d.upcoming <> 0 OR d.past <> 0);
+  UPDATE "Artist" a SET upcoming_shows_count = a.upcoming_shows_count + d.upcoming,
+                        past_shows_count = a.past_shows_count + d.past
+    FROM (SELECT id, coalesce(sum(sign) FILTER (WHERE up), 0) AS upcoming,
+                 coalesce(sum(sign) FILTER (WHERE NOT up), 0) AS past
+          FROM unnest(artist_ids, is_upcoming, deltas) AS c(id, up, sign) GROUP BY id) AS d
+    WHERE a.id = d.id AND (d.upcoming <> 0 OR d.past <> 0);
+  RETURN NULL;
+END $$ LANGUAGE plpgsql
+"""
+
+BATCH_SIZE = 10000
+
+# absolute counts for one id range. Taking the boundary row FOR UPDATE first
+# waits for every writer whose trigger already ran (they hold it FOR SHARE)
+# and holds off new ones, so the UPDATE's snapshot misses no show and no
+# trigger adds one on top of it
+BACKFILL = (
+    'UPDATE "{table}" t SET upcoming_shows_count = d.upcoming, past_shows_count = d.past '
+    'FROM (SELECT {key} AS id, count(*) FILTER (WHERE start_time >= b.refreshed_at) AS upcoming, '
+    'count(*) FILTER (WHERE start_time < b.refreshed_at) AS past '
+    'FROM "Shows", show_stats_refreshed b WHERE {key} >= :low AND {key} < :high GROUP BY {key}) AS d '
+    'WHERE t.id = d.id')
+
+TRIGGERS = [
+    ('count_shows_insert', 'INSERT', 'REFERENCING NEW TABLE AS new_shows'),
+    ('count_shows_update', 'UPDATE', 'REFERENCING OLD TABLE AS old_shows NEW TABLE AS new_shows'),
+    ('count_shows_delete', 'DELETE', 'REFERENCING OLD TABLE AS old_shows'),
+]
+
+
+def upgrade():
+    op.create_table('show_stats_refreshed',
+                    sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False))
+    for table, key in COUNTED:
+        # constant defaults, so no table rewrite
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.get_context().autocommit_block():
+        # commits the new table and columns
+        pass
+
+    # from here on every write to Shows adjusts the counters; writes wait
+    # only while the triggers are created, reads carry on
+    op.execute('LOCK TABLE "Shows" IN SHARE ROW EXCLUSIVE MODE')
+    op.execute('INSERT INTO show_stats_refreshed (refreshed_at) VALUES (now())')
+    op.execute(COUNT_SHOWS_FUNCTION)
+    for name, operation, referencing in TRIGGERS:
+        op.execute('CREATE TRIGGER %s AFTER %s ON "Shows" %s FOR EACH STATEMENT EXECUTE PROCEDURE count_shows()'
+                   % (name, operation, referencing))
+
+    with op.get_context().autocommit_block():
+        # then count the shows that were already there, one short
+        # transaction per batch of venues / artists
+        conn = op.get_bind()
+        for table, key in COUNTED:
+            low, high = conn.execute(sa.text('SELECT min(id), max(id) FROM "%s"' % table)).fetchone()
+            if low is None:
+                continue
+            while low <= high:
+                conn.exec_driver_sql('BEGIN')
+                conn.execute(sa.text('SELECT refreshed_at FROM show_stats_refreshed FOR UPDATE'))
+                conn.execute(sa.text(BACKFILL.format(table=table, key=key)),
+                             {'low': low, 'high': low + BATCH_SIZE})
+                conn.exec_driver_sql('COMMIT')
+                low += BATCH_SIZE
+
+
+def downgrade():
+    for name, operation, referencing in TRIGGERS:
+        op.execute('DROP TRIGGER IF EXISTS %s ON "Shows"' % name)
+    op.execute('DROP FUNCTION IF EXISTS count_shows()')
+    for table, key in COUNTED:
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_table('show_stats_refreshed')
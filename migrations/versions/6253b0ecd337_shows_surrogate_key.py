@@ -0,0 +1,88 @@
+"""surrogate key and lookup indexes for Shows
+
+Revision ID: 6253b0ecd337
+Revises: 16363e0e5eb9
+Create Date: 2026-10-18 10:41:55.018342
+
+Every step is either a metadata-only change, a batched backfill or a
+CONCURRENTLY built index, so Shows stays readable and writable throughout.
+The NOT NULL check is added NOT VALID and committed before it is validated,
+so its ACCESS EXCLUSIVE lock is not held through the validation scan.
+
+id also becomes the last column of the /shows keyset index: (start_time,
+venue_id, artist_id) is no longer unique once a pair can play twice.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6253b0ecd337'
+down_revision = '16363e0e5eb9'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+
+def upgrade():
+    # new rows get an id straight away; adding a column without a default
+    # does not rewrite the table
+    op.add_column('Shows', sa.Column('id', sa.Integer(), nullable=True))
+    op.execute('CREATE SEQUENCE IF NOT EXISTS "Shows_id_seq" OWNED BY "Shows".id')
+    op.execute('ALTER TABLE "Shows" ALTER COLUMN id SET DEFAULT nextval(\'"Shows_id_seq"\')')
+
+    with op.get_context().autocommit_block():
+        # backfill existing rows in short transactions
+        conn = op.get_bind()
+        while True:
+            result = conn.execute(sa.text(
+                'UPDATE "Shows" SET id = nextval(\'"Shows_id_seq"\') '
+                'WHERE ctid IN (SELECT ctid FROM "Shows" WHERE id IS NULL LIMIT :batch)'),
+                {'batch': BATCH_SIZE})
+            if result.rowcount == 0:
+                break
+
+        op.create_index('Shows_id_key', 'Shows', ['id'], unique=True,
+                        postgresql_concurrently=True)
+        op.create_index('ix_Shows_venue_id_start_time', 'Shows', ['venue_id', 'start_time'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_Shows_artist_id_start_time', 'Shows', ['artist_id', 'start_time'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_Shows_start_time_venue_id_artist_id_id', 'Shows',
+                        ['start_time', 'venue_id', 'artist_id', 'id'],
+                        unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_Shows_start_time_venue_id_artist_id', table_name='Shows',
+                      postgresql_concurrently=True)
+
+    # a validated CHECK lets SET NOT NULL skip its full-table scan. Adding it
+    # NOT VALID is instant; the autocommit block below commits it before the
+    # scan, which then only holds SHARE UPDATE EXCLUSIVE
+    op.execute('ALTER TABLE "Shows" ADD CONSTRAINT "Shows_id_not_null" CHECK (id IS NOT NULL) NOT VALID')
+    with op.get_context().autocommit_block():
+        op.execute('ALTER TABLE "Shows" VALIDATE CONSTRAINT "Shows_id_not_null"')
+    op.alter_column('Shows', 'id', existing_type=sa.Integer(), nullable=False)
+    op.execute('ALTER TABLE "Shows" DROP CONSTRAINT "Shows_id_not_null"')
+
+    # swap the (artist_id, venue_id) key for the prebuilt unique index
+    op.execute('ALTER TABLE "Shows" DROP CONSTRAINT IF EXISTS "Shows_pkey"')
+    op.execute('ALTER TABLE "Shows" ADD CONSTRAINT "Shows_pkey" PRIMARY KEY USING INDEX "Shows_id_key"')
+    op.alter_column('Shows', 'artist_id', existing_type=sa.Integer(), nullable=False)
+    op.alter_column('Shows', 'venue_id', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_Shows_start_time_venue_id_artist_id', 'Shows',
+                        ['start_time', 'venue_id', 'artist_id'],
+                        unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_Shows_start_time_venue_id_artist_id_id', table_name='Shows',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_Shows_artist_id_start_time', table_name='Shows',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_Shows_venue_id_start_time', table_name='Shows',
+                      postgresql_concurrently=True)
+    op.drop_constraint('Shows_pkey', 'Shows', type_='primary')
+    op.drop_column('Shows', 'id')
+    op.create_primary_key('Shows_pkey', 'Shows', ['artist_id', 'venue_id'])
@@ -0,0 +1,30 @@
+"""index Shows for keyset pagination
+
+Revision ID: 8b2249d8b8e6
+Revises: 9beac827d1e9
+Create Date: 2026-10-18 09:12:41.204417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2249d8b8e6'
+down_revision = '9beac827d1e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_Shows_start_time_venue_id_artist_id', 'Shows',
+                        ['start_time', 'venue_id', 'artist_id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Shows_start_time_venue_id_artist_id', table_name='Shows',
+                      postgresql_concurrently=True)
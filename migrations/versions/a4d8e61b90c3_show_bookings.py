@@ -0,0 +1,104 @@
+"""show end times and booking exclusion constraints
+
+Revision ID: a4d8e61b90c3
+Revises: e5a93c1f7b24
+Create Date: 2026-10-18 21:25:08.941273
+
+Existing shows get an end_time SHOW_DEFAULT_MINUTES after their start.
+Shows that already overlap another at the same venue or with the same
+artist are flagged double_booked and left out of the constraints; see
+bookings.py.
+
+Locks, in order:
+
+- the backfill runs in short batches, Shows stays readable and writable;
+- ck_Shows_end_time is added NOT VALID (a brief ACCESS EXCLUSIVE, after
+  writes were held off to fix up rows listed during the backfill) and
+  validated in its own transaction, which only blocks other schema changes;
+- the exclusion constraints cannot be built CONCURRENTLY nor from an
+  existing index: writes wait while the overlaps are flagged, then reads
+  and writes both wait while their two GiST indexes are built, which is
+  proportional to the size of Shows. Run it in a quiet period; lock_timeout
+  makes it give up instead of queueing behind a long query;
+- the indexes over the flagged shows are built CONCURRENTLY.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d8e61b90c3'
+down_revision = 'e5a93c1f7b24'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+# config.SHOW_DEFAULT_MINUTES at the time of writing; migrations do not read
+# the app's config
+SHOW_DEFAULT_MINUTES = 180
+
+BOOKED_RANGE = 'tstzrange(start_time, end_time)'
+
+BACKFILL = ('UPDATE "Shows" SET end_time = start_time + make_interval(mins => :minutes) '
+            'WHERE ctid IN (SELECT ctid FROM "Shows" WHERE end_time IS NULL AND start_time IS NOT NULL '
+            'LIMIT :batch)')
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('Shows', sa.Column('end_time', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('Shows', sa.Column('double_booked', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    with op.get_context().autocommit_block():
+        # commits the columns, then backfills existing rows in short transactions
+        conn = op.get_bind()
+        while conn.execute(sa.text(BACKFILL), {'minutes': SHOW_DEFAULT_MINUTES, 'batch': BATCH_SIZE}).rowcount:
+            pass
+
+    op.execute('LOCK TABLE "Shows" IN SHARE ROW EXCLUSIVE MODE')
+    # shows listed while the backfill ran
+    op.execute(sa.text('UPDATE "Shows" SET end_time = start_time + make_interval(mins => :minutes) '
+                       'WHERE end_time IS NULL AND start_time IS NOT NULL').bindparams(minutes=SHOW_DEFAULT_MINUTES))
+    op.execute('ALTER TABLE "Shows" ADD CONSTRAINT "ck_Shows_end_time" '
+               'CHECK ((start_time IS NULL) = (end_time IS NULL) AND end_time > start_time) NOT VALID')
+
+    with op.get_context().autocommit_block():
+        # commits the NOT VALID constraint first, so the validating scan only
+        # holds SHARE UPDATE EXCLUSIVE
+        op.execute('ALTER TABLE "Shows" VALIDATE CONSTRAINT "ck_Shows_end_time"')
+
+    op.execute("SET LOCAL lock_timeout = '10s'")
+    op.execute('LOCK TABLE "Shows" IN SHARE ROW EXCLUSIVE MODE')
+    # a show is double-booked when it starts before an earlier show at the
+    # same venue, or with the same artist, has ended
+    op.execute('UPDATE "Shows" s SET double_booked = true FROM ('
+               'SELECT id, coalesce(max(end_time) OVER (PARTITION BY venue_id ORDER BY start_time, id '
+               'ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) > start_time, false) '
+               'OR coalesce(max(end_time) OVER (PARTITION BY artist_id ORDER BY start_time, id '
+               'ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) > start_time, false) AS clashes '
+               'FROM "Shows" WHERE start_time IS NOT NULL) AS o '
+               'WHERE s.id = o.id AND o.clashes')
+    for key in ('venue_id', 'artist_id'):
+        op.execute('ALTER TABLE "Shows" ADD CONSTRAINT "ex_Shows_%s_booking" EXCLUDE USING gist '
+                   '(%s WITH =, %s WITH &&) WHERE (start_time IS NOT NULL AND NOT double_booked)'
+                   % (key[:-3], key, BOOKED_RANGE))
+
+    # CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        for key in ('venue_id', 'artist_id'):
+            op.execute('CREATE INDEX CONCURRENTLY "ix_Shows_double_booked_%s_range" ON "Shows" '
+                       'USING gist (%s, %s) WHERE start_time IS NOT NULL AND double_booked'
+                       % (key[:-3], key, BOOKED_RANGE))
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Shows_double_booked_artist_range', table_name='Shows', postgresql_concurrently=True)
+        op.drop_index('ix_Shows_double_booked_venue_range', table_name='Shows', postgresql_concurrently=True)
+    op.drop_constraint('ex_Shows_artist_booking', 'Shows')
+    op.drop_constraint('ex_Shows_venue_booking', 'Shows')
+    op.drop_constraint('ck_Shows_end_time', 'Shows')
+    op.drop_column('Shows', 'double_booked')
+    op.drop_column('Shows', 'end_time')
@@ -0,0 +1,31 @@
+"""GIN indexes on the genres arrays for the genre filters
+
+Revision ID: b71d05e3c28a
+Revises: 4e1c7b92a6d0
+Create Date: 2026-10-18 20:12:46.180394
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71d05e3c28a'
+down_revision = '4e1c7b92a6d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False,
+                        postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False,
+                        postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Venue_genres', table_name='Venue', postgresql_concurrently=True)
+        op.drop_index('ix_Artist_genres', table_name='Artist', postgresql_concurrently=True)
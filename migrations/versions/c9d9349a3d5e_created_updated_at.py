@@ -0,0 +1,95 @@
+"""created_at / updated_at on Venue, Artist and Shows
+
+Revision ID: c9d9349a3d5e
+Revises: 6253b0ecd337
+Create Date: 2026-10-18 18:20:44.310527
+
+now() is stable, so since Postgres 11 adding the columns with it as the
+default is a metadata-only change: existing rows read the migration's
+timestamp without the tables being rewritten.
+
+Deletes leave no updated_at behind, so a statement trigger stamps them per
+table in table_deletions. Renaming an artist or a venue, or changing its
+image, touches the updated_at of its shows, whose rows on the detail pages
+carry both.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9d9349a3d5e'
+down_revision = '6253b0ecd337'
+branch_labels = None
+depends_on = None
+
+TABLES = ['Venue', 'Artist', 'Shows']
+BOOKED = [('Venue', 'venue_id'), ('Artist', 'artist_id')]
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('created_at', sa.DateTime(timezone=True),
+                                       server_default=sa.func.now(), nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True),
+                                       server_default=sa.func.now(), nullable=False))
+
+    # keeps updated_at current for every UPDATE that changes a row, whether it
+    # comes from the ORM, the importer or psql
+    op.execute('CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$ '
+               'BEGIN NEW.updated_at := now(); RETURN NEW; END $$ LANGUAGE plpgsql')
+    for table in TABLES:
+        op.execute('CREATE TRIGGER touch_updated_at BEFORE UPDATE ON "%s" '
+                   'FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*) '
+                   'EXECUTE PROCEDURE touch_updated_at()' % table)
+
+    op.execute("CREATE OR REPLACE FUNCTION touch_booked_shows() RETURNS trigger AS $$ "
+               "BEGIN EXECUTE 'UPDATE \"Shows\" SET updated_at = now() WHERE ' || quote_ident(TG_ARGV[0]) || ' = $1' "
+               "USING NEW.id; RETURN NULL; END $$ LANGUAGE plpgsql")
+    for table, key in BOOKED:
+        op.execute('CREATE TRIGGER touch_booked_shows AFTER UPDATE OF name, image_link ON "%s" FOR EACH ROW '
+                   'WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.image_link IS DISTINCT FROM NEW.image_link) '
+                   "EXECUTE PROCEDURE touch_booked_shows('%s')" % (table, key))
+
+    op.create_table('table_deletions',
+                    sa.Column('table_name', sa.String(), nullable=False),
+                    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.PrimaryKeyConstraint('table_name'))
+    op.execute('CREATE OR REPLACE FUNCTION note_deletion() RETURNS trigger AS $$ '
+               'BEGIN INSERT INTO table_deletions (table_name, deleted_at) VALUES (TG_TABLE_NAME, now()) '
+               'ON CONFLICT (table_name) DO UPDATE SET deleted_at = EXCLUDED.deleted_at; RETURN NULL; END '
+               '$$ LANGUAGE plpgsql')
+    for table in TABLES:
+        op.execute('CREATE TRIGGER note_deletion AFTER DELETE ON "%s" '
+                   'FOR EACH STATEMENT EXECUTE PROCEDURE note_deletion()' % table)
+
+    # CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.create_index('ix_%s_updated_at' % table, table, ['updated_at'], unique=False,
+                            postgresql_concurrently=True)
+        # the ETags of the detail pages, see conditional.py
+        for _, key in BOOKED:
+            op.create_index('ix_Shows_%s_updated_at' % key, 'Shows', [key, 'updated_at'], unique=False,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for _, key in BOOKED:
+            op.drop_index('ix_Shows_%s_updated_at' % key, table_name='Shows', postgresql_concurrently=True)
+        for table in TABLES:
+            op.drop_index('ix_%s_updated_at' % table, table_name=table, postgresql_concurrently=True)
+    for table in TABLES:
+        op.execute('DROP TRIGGER IF EXISTS note_deletion ON "%s"' % table)
+        op.execute('DROP TRIGGER IF EXISTS touch_updated_at ON "%s"' % table)
+    for table, _ in BOOKED:
+        op.execute('DROP TRIGGER IF EXISTS touch_booked_shows ON "%s"' % table)
+    op.execute('DROP FUNCTION IF EXISTS touch_booked_shows()')
+    op.execute('DROP FUNCTION IF EXISTS note_deletion()')
+    op.execute('DROP FUNCTION IF EXISTS touch_updated_at()')
+    op.drop_table('table_deletions')
+    for table in TABLES:
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'created_at')
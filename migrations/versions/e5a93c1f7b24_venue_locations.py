@@ -0,0 +1,60 @@
+"""venue coordinates and geohash index for proximity search
+
+Revision ID: e5a93c1f7b24
+Revises: b71d05e3c28a
+Create Date: 2026-10-18 20:47:31.662015
+
+The coordinates come from city_locations; run `flask load-cities` after
+upgrading to fill the table and locate the existing venues.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a93c1f7b24'
+down_revision = 'b71d05e3c28a'
+branch_labels = None
+depends_on = None
+
+LOCATE_VENUE_FUNCTION = """
+CREATE OR REPLACE FUNCTION locate_venue() RETURNS trigger AS $$
+BEGIN
+  SELECT latitude, longitude, geohash INTO NEW.latitude, NEW.longitude, NEW.geohash
+    FROM city_locations WHERE lower(city) = lower(NEW.city) AND state = NEW.state;
+  RETURN NEW;
+END $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.create_table('city_locations',
+                    sa.Column('city', sa.String(length=120), nullable=False),
+                    sa.Column('state', sa.String(length=120), nullable=False),
+                    sa.Column('latitude', sa.Float(), nullable=False),
+                    sa.Column('longitude', sa.Float(), nullable=False),
+                    sa.Column('geohash', sa.String(length=12), nullable=False),
+                    sa.PrimaryKeyConstraint('city', 'state'))
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('geohash', sa.String(length=12), nullable=True))
+    op.execute(LOCATE_VENUE_FUNCTION)
+    op.execute('CREATE TRIGGER locate_venue BEFORE INSERT OR UPDATE OF city, state ON "Venue" '
+               'FOR EACH ROW EXECUTE PROCEDURE locate_venue()')
+
+    # CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_Venue_geohash', 'Venue', ['geohash'], unique=False,
+                        postgresql_ops={'geohash': 'varchar_pattern_ops'}, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Venue_geohash', table_name='Venue', postgresql_concurrently=True)
+    op.execute('DROP TRIGGER IF EXISTS locate_venue ON "Venue"')
+    op.execute('DROP FUNCTION IF EXISTS locate_venue()')
+    op.drop_column('Venue', 'geohash')
+    op.drop_column('Venue', 'longitude')
+    op.drop_column('Venue', 'latitude')
+    op.drop_table('city_locations')
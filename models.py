@@ -0,0 +1,305 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+from replicas import replicas
+
+class RoutingSession(SignallingSession):
+    # sends the queries of @read_only views to the replica picked for the
+    # request (see replicas.py); flushes always go to the primary
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = replicas.current()
+        if replica is not None and not self._flushing:
+            return replica.engine
+        return SignallingSession.get_bind(self, mapper, clause)
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+# bound to the application in create_app(), see app.py
+db = RoutingSQLAlchemy()
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    genres = db.Column(db.ARRAY(db.String(120)))
+    phone = db.Column(db.String(120), unique=True)
+    image_link = db.Column(db.String(500))
+    website_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    seeking_talent=db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description=db.Column(db.Text())
+    # the city's coordinates, set by the locate_venue trigger, see geo.py
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))
+    # kept current by the count_shows trigger, see Show statistics below
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+    # bumped by the touch_updated_at trigger (bottom of this file) on every
+    # UPDATE that changes the row, whichever code path runs it
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+
+    # trigram index used by the venue search
+    __table_args__ = (
+      db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin',
+               postgresql_ops={'name': 'gin_trgm_ops'}),
+      # max(updated_at) for the ETags, see conditional.py
+      db.Index('ix_Venue_updated_at', 'updated_at'),
+      # the ?genre= filters (&& and @>) on /venues, see filter_listing()
+      db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+      # LIKE 'prefix%' range scans for /venues/near
+      db.Index('ix_Venue_geohash', 'geohash', postgresql_ops={'geohash': 'varchar_pattern_ops'}),
+    )
+
+    def __repr__(self) -> str:
+      return f'<Venue ID: {self.id}, Name: {self.name} >'
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120), unique=True)
+    genres = db.Column(db.ARRAY(db.String(120)))
+    image_link = db.Column(db.String(500))
+    website_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    seeking_venue=db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description=db.Column(db.Text())
+    # kept current by the count_shows trigger, see Show statistics below
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+    # bumped by the touch_updated_at trigger (bottom of this file) on every
+    # UPDATE that changes the row, whichever code path runs it
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+    show = db.relationship('Shows')
+
+    # trigram index used by the artist search
+    __table_args__ = (
+      db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin',
+               postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_Artist_updated_at', 'updated_at'),
+      db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+    )
+
+    def __repr__(self) -> str:
+      return f'<Artist ID: {self.id}, Name: {self.name} >'
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+# the time a show occupies, and which shows the booking constraints cover
+BOOKED_RANGE = 'tstzrange(start_time, end_time)'
+BOOKED = 'start_time IS NOT NULL AND NOT double_booked'
+DOUBLE_BOOKED = 'start_time IS NOT NULL AND double_booked'
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+class Shows(db.Model):
+  __tablename__ = 'Shows'
+
+  id = db.Column(db.Integer, primary_key=True)
+  start_time = db.Column(db.DateTime(timezone=True))
+  # the show occupies [start_time, end_time) at the venue and for the artist
+  end_time = db.Column(db.DateTime(timezone=True))
+  # exempt from the booking constraints below, see bookings.py
+  double_booked = db.Column(db.Boolean, nullable=False, server_default=db.false())
+  artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
+  venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+  created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+  updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+  venue = db.relationship("Venue")
+
+  __table_args__ = (
+    # backs the keyset pagination on /shows (see show_cursor_key()) and any
+    # other query that ranges over start_time alone
+    db.Index('ix_Shows_start_time_venue_id_artist_id_id', 'start_time', 'venue_id', 'artist_id', 'id'),
+    # one venue's / one artist's shows in time order, for the detail pages
+    db.Index('ix_Shows_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_Shows_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_Shows_updated_at', 'updated_at'),
+    # the latest change to one venue's / one artist's shows, for their ETags
+    db.Index('ix_Shows_venue_id_updated_at', 'venue_id', 'updated_at'),
+    db.Index('ix_Shows_artist_id_updated_at', 'artist_id', 'updated_at'),
+    db.CheckConstraint('(start_time IS NULL) = (end_time IS NULL) AND end_time > start_time',
+                       name='ck_Shows_end_time'),
+    # no venue and no artist booked twice at once; the GiST indexes behind
+    # them also answer the free slot queries
+    ExcludeConstraint(('venue_id', '='), (db.text(BOOKED_RANGE), '&&'), using='gist',
+                      where=db.text(BOOKED), name='ex_Shows_venue_booking'),
+    ExcludeConstraint(('artist_id', '='), (db.text(BOOKED_RANGE), '&&'), using='gist',
+                      where=db.text(BOOKED), name='ex_Shows_artist_booking'),
+    # and the exempt shows, which new shows are checked against explicitly
+    db.Index('ix_Shows_double_booked_venue_range', 'venue_id', db.text(BOOKED_RANGE),
+             postgresql_using='gist', postgresql_where=db.text(DOUBLE_BOOKED)),
+    db.Index('ix_Shows_double_booked_artist_range', 'artist_id', db.text(BOOKED_RANGE),
+             postgresql_using='gist', postgresql_where=db.text(DOUBLE_BOOKED)),
+  )
+
+  def __repr__(self) -> str:
+    return f'<Show ID: {self.id}, Venue ID: {self.venue_id}, Artist ID: {self.artist_id}, StartTime: {self.start_time}>'
+
+# the trigram indexes need pg_trgm before the tables are created
+db.event.listen(db.metadata, 'before_create', db.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+# and the booking constraints btree_gist, for the = on venue_id / artist_id
+db.event.listen(db.metadata, 'before_create', db.DDL('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+
+# updated_at is maintained by Postgres rather than by the ORM so that bulk
+# loads, the importer's upserts and hand-written SQL keep it current too
+db.event.listen(db.metadata, 'before_create', db.DDL(
+  "CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$ "
+  "BEGIN NEW.updated_at := now(); RETURN NEW; END $$ LANGUAGE plpgsql"))
+for table in (Venue.__table__, Artist.__table__, Shows.__table__):
+  db.event.listen(table, 'after_create', db.DDL(
+    'CREATE TRIGGER touch_updated_at BEFORE UPDATE ON %(fullname)s '
+    'FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*) EXECUTE PROCEDURE touch_updated_at()'))
+
+# a show's row on a detail page carries the other side's name and image, so
+# renaming an artist or a venue touches its shows: the ETag of every page
+# showing it then moves through the shows' updated_at, see conditional.py
+db.event.listen(db.metadata, 'before_create', db.DDL(
+  "CREATE OR REPLACE FUNCTION touch_booked_shows() RETURNS trigger AS $$ "
+  "BEGIN EXECUTE 'UPDATE \"Shows\" SET updated_at = now() WHERE ' || quote_ident(TG_ARGV[0]) || ' = $1' "
+  "USING NEW.id; RETURN NULL; END $$ LANGUAGE plpgsql"))
+for table, key in ((Venue.__table__, 'venue_id'), (Artist.__table__, 'artist_id')):
+  db.event.listen(table, 'after_create', db.DDL(
+    'CREATE TRIGGER touch_booked_shows AFTER UPDATE OF name, image_link ON %%(fullname)s FOR EACH ROW '
+    'WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.image_link IS DISTINCT FROM NEW.image_link) '
+    "EXECUTE PROCEDURE touch_booked_shows('%s')" % key))
+
+# a deleted row leaves no updated_at behind, so deletes are stamped per table
+# here instead; conditional.py reads it with a primary key lookup where it
+# used to count the whole table
+table_deletions = db.Table('table_deletions', db.metadata,
+  db.Column('table_name', db.String, primary_key=True),
+  db.Column('deleted_at', db.DateTime(timezone=True), nullable=False))
+
+db.event.listen(db.metadata, 'before_create', db.DDL(
+  "CREATE OR REPLACE FUNCTION note_deletion() RETURNS trigger AS $$ "
+  "BEGIN INSERT INTO table_deletions (table_name, deleted_at) VALUES (TG_TABLE_NAME, now()) "
+  "ON CONFLICT (table_name) DO UPDATE SET deleted_at = EXCLUDED.deleted_at; RETURN NULL; END "
+  "$$ LANGUAGE plpgsql"))
+for table in (Venue.__table__, Artist.__table__, Shows.__table__):
+  db.event.listen(table, 'after_create', db.DDL(
+    'CREATE TRIGGER note_deletion AFTER DELETE ON %(fullname)s '
+    'FOR EACH STATEMENT EXECUTE PROCEDURE note_deletion()'))
+
+#----------------------------------------------------------------------------#
+# Show statistics.
+#----------------------------------------------------------------------------#
+
+# upcoming_shows_count / past_shows_count on Venue and Artist count the shows
+# starting at or after / before refreshed_at, the one row of this table. The
+# count_shows trigger applies every insert, update and delete on "Shows" to
+# them; show_stats.py moves refreshed_at forward as time passes, shifting the
+# shows it skips over from upcoming to past, and repairs any drift.
+show_stats_refreshed = db.Table('show_stats_refreshed', db.metadata,
+  db.Column('refreshed_at', db.DateTime(timezone=True), nullable=False))
+
+db.event.listen(show_stats_refreshed, 'after_create', db.DDL(
+  'INSERT INTO show_stats_refreshed (refreshed_at) VALUES (now())'))
+
+# Statement-level, so a bulk INSERT ... SELECT costs one UPDATE per table
+# rather than two per show. The shared lock on the refreshed_at row makes a
+# refresh wait for the writes counted against the old boundary, and the
+# writes wait for the refresh. Bulk loaders that recount afterwards turn it
+# off for their session with SET fyyur.count_shows = off.
+COUNT_SHOWS_FUNCTION = """
+CREATE OR REPLACE FUNCTION count_shows() RETURNS trigger AS $$
+DECLARE
+  boundary timestamptz;
+  venue_ids integer[];
+  artist_ids integer[];
+  is_upcoming boolean[];
+  deltas integer[];
+BEGIN
+  IF current_setting('fyyur.count_shows', true) = 'off' THEN
+    RETURN NULL;
+  END IF;
+  SELECT refreshed_at INTO boundary FROM show_stats_refreshed FOR SHARE;
+  IF TG_OP = 'INSERT' THEN
+    SELECT array_agg(venue_id), array_agg(artist_id), array_agg(start_time >= boundary), array_agg(1)
+      INTO venue_ids, artist_ids, is_upcoming, deltas FROM new_shows;
+  ELSIF TG_OP = 'DELETE' THEN
+    SELECT array_agg(venue_id), array_agg(artist_id), array_agg(start_time >= boundary), array_agg(-1)
+      INTO venue_ids, artist_ids, is_upcoming, deltas FROM old_shows;
+  ELSE
+    SELECT array_agg(venue_id), array_agg(artist_id), array_agg(start_time >= boundary), array_agg(sign)
+      INTO venue_ids, artist_ids, is_upcoming, deltas
+      FROM (SELECT venue_id, artist_id, start_time, 1 AS sign FROM new_shows
+            UNION ALL SELECT venue_id, artist_id, start_time, -1 FROM old_shows) AS changed;
+  END IF;
+  UPDATE "Venue" v SET upcoming_shows_count = v.upcoming_shows_count + d.upcoming,
+                       past_shows_count = v.past_shows_count + d.past
+    FROM (SELECT id, coalesce(sum(sign) FILTER (WHERE up), 0) AS upcoming,
+                 coalesce(sum(sign) FILTER (WHERE NOT up), 0) AS past
+          FROM unnest(venue_ids, is_upcoming, deltas) AS c(id, up, sign) GROUP BY id) AS d
+    WHERE v.id = d.id AND (d.upcoming <> 0 OR d.past <> 0);
+  UPDATE "Artist" a SET upcoming_shows_count = a.upcoming_shows_count + d.upcoming,
+                        past_shows_count = a.past_shows_count + d.past
+    FROM (SELECT id, coalesce(sum(sign) FILTER (WHERE up), 0) AS upcoming,
+                 coalesce(sum(sign) FILTER (WHERE NOT up), 0) AS past
+          FROM unnest(artist_ids, is_upcoming, deltas) AS c(id, up, sign) GROUP BY id) AS d
+    WHERE a.id = d.id AND (d.upcoming <> 0 OR d.past <> 0);
+  RETURN NULL;
+END $$ LANGUAGE plpgsql
+"""
+
+# transition tables allow one event per trigger
+COUNT_SHOWS_TRIGGERS = [
+  ('count_shows_insert', 'INSERT', 'REFERENCING NEW TABLE AS new_shows'),
+  ('count_shows_update', 'UPDATE', 'REFERENCING OLD TABLE AS old_shows NEW TABLE AS new_shows'),
+  ('count_shows_delete', 'DELETE', 'REFERENCING OLD TABLE AS old_shows'),
+]
+
+db.event.listen(db.metadata, 'before_create', db.DDL(COUNT_SHOWS_FUNCTION))
+for name, operation, referencing in COUNT_SHOWS_TRIGGERS:
+  db.event.listen(Shows.__table__, 'after_create', db.DDL(
+    'CREATE TRIGGER %s AFTER %s ON "Shows" %s FOR EACH STATEMENT EXECUTE PROCEDURE count_shows()'
+    % (name, operation, referencing)))
+
+#----------------------------------------------------------------------------#
+# Venue locations.
+#----------------------------------------------------------------------------#
+
+# Coordinates per city, loaded from cities.csv by `flask load-cities`
+city_locations = db.Table('city_locations', db.metadata,
+  db.Column('city', db.String(120), primary_key=True),
+  db.Column('state', db.String(120), primary_key=True),
+  db.Column('latitude', db.Float, nullable=False),
+  db.Column('longitude', db.Float, nullable=False),
+  db.Column('geohash', db.String(12), nullable=False))
+
+# Any insert, and any update moving the venue to another city, picks up the
+# city's coordinates; cities missing from the table leave them NULL.
+LOCATE_VENUE_FUNCTION = """
+CREATE OR REPLACE FUNCTION locate_venue() RETURNS trigger AS $$
+BEGIN
+  SELECT latitude, longitude, geohash INTO NEW.latitude, NEW.longitude, NEW.geohash
+    FROM city_locations WHERE lower(city) = lower(NEW.city) AND state = NEW.state;
+  RETURN NEW;
+END $$ LANGUAGE plpgsql
+"""
+
+db.event.listen(db.metadata, 'before_create', db.DDL(LOCATE_VENUE_FUNCTION))
+db.event.listen(Venue.__table__, 'after_create', db.DDL(
+  'CREATE TRIGGER locate_venue BEFORE INSERT OR UPDATE OF city, state ON "Venue" '
+  'FOR EACH ROW EXECUTE PROCEDURE locate_venue()'))
@@ -0,0 +1,339 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+import base64
+from datetime import datetime
+from flask import current_app, request, session
+from sqlalchemy import tuple_
+from models import db, Venue, Artist, Shows
+from forms import Genres, States
+from geo import cover, EARTH_RADIUS_KM
+
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+# /shows is paginated on (start_time, venue_id, artist_id, id) instead of
+# OFFSET so that every page is an index range scan, no matter how deep the
+# reader goes. id comes last so that the key is unique: the same artist can
+# play the same venue twice at one start time.
+def show_cursor_key():
+  return tuple_(Shows.start_time, Shows.venue_id, Shows.artist_id, Shows.id)
+
+def encode_show_cursor(start_time, venue_id, artist_id, show_id):
+  raw = json.dumps([start_time.isoformat(), venue_id, artist_id, show_id])
+  return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_show_cursor(cursor):
+  # raises ValueError for anything encode_show_cursor() did not produce
+  padded = cursor + '=' * (-len(cursor) % 4)
+  try:
+    start_time, venue_id, artist_id, show_id = json.loads(base64.urlsafe_b64decode(padded))
+    return datetime.fromisoformat(start_time), int(venue_id), int(artist_id), int(show_id)
+  except (TypeError, ValueError) as error:
+    # binascii.Error and JSONDecodeError are ValueErrors too
+    raise ValueError('invalid show cursor %r' % cursor) from error
+
+def show_cursors(args):
+  """The decoded ?after= / ?before= cursors of /shows; raises ValueError."""
+  after, before = args.get('after'), args.get('before')
+  return (decode_show_cursor(after) if after else None,
+          decode_show_cursor(before) if before else None)
+
+def page_size(default, maximum):
+  size = request.args.get('per_page', default, type=int)
+  return max(1, min(size, maximum))
+
+def show_page_query(per_page, after=None, before=None):
+  query = db.session.query(Venue.id, Venue.name, Artist.id, Artist.name, Artist.image_link, Shows.start_time, Shows.id)\
+    .join(Venue, Venue.id == Shows.venue_id)\
+    .join(Artist, Artist.id == Shows.artist_id)\
+    .filter(Shows.start_time != None)
+  if before:
+    # walk the index backwards and flip the page afterwards
+    query = query.filter(show_cursor_key() < before)\
+      .order_by(Shows.start_time.desc(), Shows.venue_id.desc(), Shows.artist_id.desc(), Shows.id.desc())
+  else:
+    if after:
+      query = query.filter(show_cursor_key() > after)
+    query = query.order_by(Shows.start_time, Shows.venue_id, Shows.artist_id, Shows.id)
+  # one extra row tells us whether there is another page without a count(*)
+  return query.limit(per_page + 1)
+
+def show_page(shows, per_page, after=None, before=None):
+  # turns the rows of show_page_query() into the template's shows and pager
+  data = []
+  pager = {}
+  has_more = len(shows) > per_page
+  shows = list(shows[:per_page])
+  if before:
+    shows.reverse()
+  if shows != []:
+    data = [{
+              "venue_id": s[0],
+              "venue_name": s[1],
+              "artist_id": s[2],
+              "artist_name": s[3],
+              "artist_image_link": s[4],
+              "start_time": s[5]
+            } for s in shows]
+    first, last = shows[0], shows[-1]
+    if (before and has_more) or (not before and after):
+      pager['prev'] = encode_show_cursor(first[5], first[0], first[2], first[6])
+    if (not before and has_more) or before:
+      pager['next'] = encode_show_cursor(last[5], last[0], last[2], last[6])
+    pager['per_page'] = per_page
+  return data, pager
+
+#----------------------------------------------------------------------------#
+# Listings.
+#----------------------------------------------------------------------------#
+
+GENRES = set(genre.value for genre in Genres)
+STATES = set(state.value for state in States)
+
+# /venues and /artists filter on ?genre= (repeatable: any of the genres, or
+# all of them with genre_match=all), ?city= and ?state=. Genres are tested
+# with the array overlap / containment operators, which the GIN indexes on
+# the genres columns answer. Raises ValueError for values the forms would
+# not accept.
+def listing_filters(args):
+  genres = sorted(set(args.getlist('genre')))
+  match = args.get('genre_match', 'any')
+  city = args.get('city', '').strip()
+  state = args.get('state', '').strip()
+  if any(genre not in GENRES for genre in genres):
+    raise ValueError('unknown genre')
+  if match not in ('any', 'all'):
+    raise ValueError('genre_match is any or all')
+  if state and state not in STATES:
+    raise ValueError('unknown state')
+  filters = {}
+  if genres:
+    filters['genre'] = genres
+    if match == 'all':
+      filters['genre_match'] = match
+  if city:
+    filters['city'] = city
+  if state:
+    filters['state'] = state
+  return filters
+
+def filter_listing(query, model, filters):
+  if 'genre' in filters:
+    # cast to the column's varchar[] so the operator matches the index's
+    genres = db.cast(filters['genre'], model.genres.type)
+    operator = '@>' if filters.get('genre_match') == 'all' else '&&'
+    query = query.filter(model.genres.op(operator)(genres))
+  if 'city' in filters:
+    query = query.filter(model.city == filters['city'])
+  if 'state' in filters:
+    query = query.filter(model.state == filters['state'])
+  return query
+
+# Listings are paginated on the primary key, the same way as /shows: after /
+# before carry the id of the last / first row of the current page.
+def listing_page_query(query, model, per_page, after=None, before=None):
+  if before:
+    query = query.filter(model.id < before).order_by(model.id.desc())
+  else:
+    if after:
+      query = query.filter(model.id > after)
+    query = query.order_by(model.id)
+  return query.limit(per_page + 1)
+
+def listing_page(rows, per_page, after=None, before=None):
+  # turns the rows of listing_page_query() into the page's rows and pager
+  pager = {}
+  has_more = len(rows) > per_page
+  rows = list(rows[:per_page])
+  if before:
+    rows.reverse()
+  if rows != []:
+    if (before and has_more) or (not before and after):
+      pager['prev'] = rows[0].id
+    if (not before and has_more) or before:
+      pager['next'] = rows[-1].id
+    pager['per_page'] = per_page
+  return rows, pager
+
+#----------------------------------------------------------------------------#
+# Show windows.
+#----------------------------------------------------------------------------#
+
+# Detail pages only render the nearest shows on either side of now(), so the
+# split and the totals are computed by Postgres rather than by filtering every
+# show the venue or artist ever had in Python.
+def venue_shows(venue_id):
+  return db.session.query(Shows.start_time, Artist.id, Artist.name, Artist.image_link)\
+    .join(Artist, Artist.id == Shows.artist_id)\
+    .filter(Shows.venue_id == venue_id)
+
+def artist_shows(artist_id):
+  return db.session.query(Shows.start_time, Venue.id, Venue.name, Venue.image_link)\
+    .join(Venue, Venue.id == Shows.venue_id)\
+    .filter(Shows.artist_id == artist_id)
+
+def show_window_queries(query, limit):
+  upcoming = query.filter(Shows.start_time >= db.func.now())\
+    .order_by(Shows.start_time).limit(limit)
+  past = query.filter(Shows.start_time < db.func.now())\
+    .order_by(Shows.start_time.desc()).limit(limit)
+  return upcoming, past
+
+def show_windows(query, limit):
+  upcoming, past = show_window_queries(query, limit)
+  return upcoming.all(), past.all()
+
+# Every venue / artist with its number of upcoming shows, a column kept
+# current by the count_shows trigger (see models.py). Used as a subquery by
+# /venues and directly by /artists and the searches.
+def venues_with_upcoming_counts():
+  return db.session.query(Venue.id, Venue.name, Venue.city, Venue.state,
+                          Venue.upcoming_shows_count.label('num_upcoming_shows'))
+
+def artists_with_upcoming_counts():
+  return db.session.query(Artist.id, Artist.name, Artist.upcoming_shows_count.label('num_upcoming_shows'))
+
+# /venues: a page of venues_with_upcoming_counts() rows grouped by area
+def venue_areas(venues):
+  areas = {}
+  for venue in venues:
+    areas.setdefault((venue.state or '', venue.city or ''), []).append(
+      {'id': venue.id, 'name': venue.name, 'num_upcoming_shows': venue.num_upcoming_shows})
+  return [{'city': city, 'state': state, 'venues': listed}
+          for (state, city), listed in sorted(areas.items())]
+
+#----------------------------------------------------------------------------#
+# Venues near a point.
+#----------------------------------------------------------------------------#
+
+# great-circle (haversine) distance in km from a venue to (latitude, longitude)
+def distance_km(latitude, longitude):
+  f = db.func
+  a = f.power(f.sin(f.radians(Venue.latitude - latitude) / 2), 2) \
+    + f.cos(f.radians(latitude)) * f.cos(f.radians(Venue.latitude)) \
+    * f.power(f.sin(f.radians(Venue.longitude - longitude) / 2), 2)
+  return 2 * EARTH_RADIUS_KM * f.asin(f.sqrt(f.least(a, 1.0)))
+
+# The geohash prefixes of cover() narrow the candidates down to a handful of
+# index range scans on ix_Venue_geohash; only those venues get the exact
+# distance test, nearest first.
+def venues_near(latitude, longitude, radius_km, limit):
+  distance = distance_km(latitude, longitude)
+  cells = [Venue.geohash.like(prefix + '%') for prefix in cover(latitude, longitude, radius_km)]
+  return db.session.query(Venue.id, Venue.name, Venue.city, Venue.state,
+                          Venue.upcoming_shows_count.label('num_upcoming_shows'),
+                          distance.label('distance_km'))\
+    .filter(db.or_(*cells))\
+    .filter(distance <= radius_km)\
+    .order_by(distance, Venue.id)\
+    .limit(limit)
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+# The template data of the venue and artist pages, shared by the sync views in
+# routes.py and the async ones in async_routes.py.
+def venue_page(venue, upcoming_shows, past_shows):
+  data = {}
+  data['id'] = venue.id
+  data['name'] = venue.name
+  data['genres'] = venue.genres
+  data['address'] = venue.address
+  data['city'] = venue.city
+  data['state'] = venue.state
+  data['phone'] = venue.phone
+  data['website'] = venue.website_link
+  data['facebook_link'] = venue.facebook_link
+  data['seeking_talent'] = venue.seeking_talent
+  data['seeking_description'] = venue.seeking_description
+  data['image_link'] = venue.image_link
+  data['past_shows'] = [ 
+                        {
+                          "artist_id": show.id, 
+                          "artist_name": show.name,
+                          "artist_image_link": show.image_link,
+                          "start_time": show.start_time,
+                        } for show in past_shows]
+  data['past_shows_count'] = venue.past_shows_count
+  data['upcoming_shows'] = [ 
+                          {
+                            "artist_id": show.id, 
+                            "artist_name": show.name,
+                            "artist_image_link": show.image_link,
+                            "start_time": show.start_time,
+                          } for show in upcoming_shows]
+
+  data['upcoming_shows_count'] = venue.upcoming_shows_count
+  return data
+
+def artist_page(artist, upcoming_shows, past_shows):
+  data = {}
+  data['id'] = artist.id
+  data['name'] = artist.name
+  data['genres'] = artist.genres
+  data['city'] = artist.city
+  data['state'] = artist.state
+  data['phone'] = artist.phone
+  data['website'] = artist.website_link
+  data['facebook_link'] = artist.facebook_link
+  data['seeking_venue'] = artist.seeking_venue
+  data['seeking_description'] = artist.seeking_description
+  data['image_link'] = artist.image_link
+  data['past_shows'] = [ 
+                          {
+                            "venue_id": show.id, 
+                            "venue_name": show.name,
+                            "venue_image_link": show.image_link,
+                            "start_time": show.start_time,
+                          } for show in past_shows]
+  data['past_shows_count'] = artist.past_shows_count
+  data['upcoming_shows'] = [ 
+                          {
+                            "venue_id": show.id, 
+                            "venue_name": show.name,
+                            "venue_image_link": show.image_link,
+                            "start_time": show.start_time,
+                          } for show in upcoming_shows]
+
+  data['upcoming_shows_count'] = artist.upcoming_shows_count
+  return data
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# Both the substring match and the % similarity operator are answered by the
+# gin_trgm_ops indexes on the name columns; results are ranked by similarity
+# so the best matches survive the SEARCH_RESULTS_LIMIT cut.
+def like_pattern(term):
+  escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+  return '%' + escaped + '%'
+
+def name_search(query, column, term):
+  matches = db.or_(column.ilike(like_pattern(term)), column.op('%')(term))
+  return query.filter(matches)\
+    .order_by(db.func.similarity(column, term).desc(), column)\
+    .limit(current_app.config['SEARCH_RESULTS_LIMIT'])
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# A venue page lists the artists playing there and an artist page lists the
+# venues, so a write to either side invalidates the pages on the other side
+# too. Pages are only cached when no flashed message is waiting to be shown.
+def venue_page_keys(venue_id):
+  artist_ids = db.session.query(Shows.artist_id).filter(Shows.venue_id == venue_id).distinct()
+  return [('venue', venue_id)] + [('artist', row.artist_id) for row in artist_ids]
+
+def artist_page_keys(artist_id):
+  venue_ids = db.session.query(Shows.venue_id).filter(Shows.artist_id == artist_id).distinct()
+  return [('artist', artist_id)] + [('venue', row.venue_id) for row in venue_ids]
+
+def page_cacheable():
+  return '_flashes' not in session
@@ -0,0 +1,154 @@
+"""Per-request SQL query counting and N+1 detection.
+
+Every statement the engine runs is timed with the before/after_cursor_execute
+events and added to the recorders active on the current thread. Each request
+gets one; tests can open their own with ``query_budget()``. Statements are
+grouped by their SQL text, which still carries the bind placeholders, so a
+lazy relationship loaded in a loop shows up as one statement repeated once per
+row. Repeats above QUERY_REPEAT_WARNING are logged with the endpoint, and in
+debug mode (or with QUERY_STATS_HEADERS) the totals are sent back as
+X-DB-Queries / X-DB-Time-ms response headers.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, request
+from sqlalchemy import event
+
+
+class QueryRecorder(object):
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold):
+        """Statements run more than ``threshold`` times, most repeated first."""
+        return [(statement, count) for statement, count in self.statements.most_common()
+                if count > threshold]
+
+    @property
+    def duration_ms(self):
+        return round(self.duration * 1000.0, 3)
+
+
+class QueryStats(object):
+
+    def __init__(self):
+        self._local = threading.local()
+        self.repeat_warning = 5
+        self.headers = False
+
+    def init_app(self, app, *engines):
+        self.repeat_warning = app.config['QUERY_REPEAT_WARNING']
+        self.headers = app.config['QUERY_STATS_HEADERS']
+        if self.headers is None:
+            self.headers = app.debug
+        for engine in engines:
+            self.listen(engine)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+
+    def listen(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    @property
+    def active(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def push(self):
+        recorder = QueryRecorder()
+        self.active.append(recorder)
+        return recorder
+
+    def pop(self, recorder):
+        if recorder in self.active:
+            self.active.remove(recorder)
+
+    def recorders(self, conn):
+        # statements async_db.py runs for a request, on its event loop's
+        # thread, carry the request's recorders on their connection
+        return conn.info.get('query_recorders') or self.active
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.recorders(conn):
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        duration = time.perf_counter() - started.pop()
+        for recorder in self.recorders(conn):
+            recorder.record(statement, duration)
+
+    def _handle_error(self, context):
+        # a failed statement never reaches after_cursor_execute; drop its
+        # start time so it does not end up timing the connection's next one
+        if context.execution_context is not None and context.connection is not None:
+            started = context.connection.info.get('query_started')
+            if started:
+                started.pop()
+
+    def _start_request(self):
+        g.query_recorder = self.push()
+
+    def _finish_request(self, response):
+        recorder = g.get('query_recorder')
+        if recorder is None:
+            return response
+        for statement, count in recorder.repeated(self.repeat_warning):
+            current_app.logger.warning('%s ran the same statement %d times, possible N+1: %s',
+                                       request.endpoint, count, ' '.join(statement.split())[:300])
+        if self.headers:
+            response.headers['X-DB-Queries'] = str(recorder.count)
+            response.headers['X-DB-Time-ms'] = str(recorder.duration_ms)
+        return response
+
+    def _teardown_request(self, error=None):
+        recorder = g.pop('query_recorder', None)
+        if recorder is not None:
+            self.pop(recorder)
+
+
+query_stats = QueryStats()
+
+
+@contextmanager
+def query_budget(max_queries, max_repeats=None):
+    """Fail with AssertionError when the block runs more than ``max_queries``.
+
+    Meant for tests, e.g. holding a route to its query budget::
+
+        with query_budget(4):
+            client.get('/venues/1')
+
+    ``max_repeats`` also bounds how often any single statement may run.
+    """
+    recorder = query_stats.push()
+    try:
+        yield recorder
+    finally:
+        query_stats.pop(recorder)
+    problems = []
+    if recorder.count > max_queries:
+        problems.append('%d queries, budget is %d' % (recorder.count, max_queries))
+    if max_repeats is not None:
+        for statement, count in recorder.repeated(max_repeats):
+            problems.append('%d x %s' % (count, ' '.join(statement.split())[:300]))
+    if problems:
+        raise AssertionError('\n'.join(problems))
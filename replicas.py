@@ -0,0 +1,153 @@
+"""Read replica routing.
+
+Every URL in DATABASE_REPLICA_URLS becomes a Flask-SQLAlchemy bind
+(replica_0, replica_1, ...). Views decorated with ``@read_only`` run their
+whole session against one replica, taken round-robin; everything else, and
+every flush, stays on the primary.
+
+A replica is used only while its last health check passed: it accepted a
+connection and was no more than REPLICA_MAX_LAG seconds behind. Checks run
+lazily when the replica comes up in the rotation, at most once per
+REPLICA_CHECK_INTERVAL, and a dropped connection marks it down straight
+away. With no healthy replica the primary serves the read.
+
+After a write (any non-GET request that is not itself read-only) the
+client's session cookie pins its reads to the primary for
+REPLICA_STICKY_SECONDS, so whoever just submitted a form sees their own
+change even while the replicas catch up. The cookie holds whichever worker
+serves the next request as long as they all sign it with the same key, so
+replicas are refused unless SECRET_KEY comes from the environment. The page
+cache is neither read nor filled while a client is pinned, nor from a replica
+lagging more than that window (see conditional.page_version()).
+Replica connections give up after REPLICA_CONNECT_TIMEOUT seconds.
+"""
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_app_context, request, session
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+
+# seconds behind the primary; 0 when everything received has been replayed,
+# since an idle primary leaves pg_last_xact_replay_timestamp() behind
+LAG_SQL = text(
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END')
+
+
+class Replica(object):
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.checked_at = None
+        # seconds behind the primary at the last check
+        self.lag = None
+
+
+class ReplicaRouter(object):
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.replicas = []
+        self.max_lag = 5.0
+        self.check_interval = 10.0
+        self.sticky_seconds = 10.0
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        """Create the replica engines; needs an application context."""
+        self.max_lag = app.config['REPLICA_MAX_LAG']
+        self.check_interval = app.config['REPLICA_CHECK_INTERVAL']
+        self.sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+        binds = app.config.get('SQLALCHEMY_BINDS') or {}
+        self.replicas = [Replica(name, db.get_engine(app, bind=name))
+                         for name in sorted(binds) if name.startswith('replica_')]
+        if self.replicas and not app.config.get('SECRET_KEY_FROM_ENV'):
+            # a per-process random key would make every other worker drop the
+            # sticky cookie, and with it the client's read-your-writes window
+            raise RuntimeError('DATABASE_REPLICA_URLS needs SECRET_KEY set in the environment, '
+                               'the same in every worker')
+        for replica in self.replicas:
+            self.watch(replica.name, replica.engine)
+        app.after_request(self._stick_after_write)
+
+    def watch(self, name, engine):
+        """Mark the replica bound as ``name`` down when ``engine`` loses a
+        connection; any other name (the primary's None) is ignored."""
+        for replica in self.replicas:
+            if replica.name == name:
+                event.listen(engine, 'handle_error', self._error_handler(replica))
+
+    @property
+    def engines(self):
+        return [replica.engine for replica in self.replicas]
+
+    def check(self, replica):
+        try:
+            with replica.engine.connect() as conn:
+                replica.lag = conn.execute(LAG_SQL).scalar()
+            replica.healthy = replica.lag is not None and replica.lag <= self.max_lag
+        except SQLAlchemyError:
+            replica.healthy = False
+            replica.lag = None
+        replica.checked_at = self.clock()
+
+    def pick(self):
+        """The next healthy replica in the rotation, or None for the primary."""
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                replica = self.replicas[next(self._next) % len(self.replicas)]
+            if replica.checked_at is None or self.clock() - replica.checked_at >= self.check_interval:
+                self.check(replica)
+            if replica.healthy:
+                return replica
+        return None
+
+    def sticky(self):
+        return session.get('db_primary_until', 0) > time.time()
+
+    def fresh(self):
+        """Whether this request's reads may be shared with other clients (the
+        page cache): not pinned to the primary after a write, and not served
+        by a replica last seen further behind than that window."""
+        if self.sticky():
+            return False
+        replica = self.current()
+        return replica is None or (replica.lag is not None and replica.lag <= self.sticky_seconds)
+
+    def current(self):
+        # the replica picked for this request, read by RoutingSession.get_bind
+        if has_app_context():
+            return g.get('db_replica')
+        return None
+
+    def _error_handler(self, replica):
+        def handle_error(context):
+            if context.is_disconnect:
+                replica.healthy = False
+                replica.checked_at = self.clock()
+        return handle_error
+
+    def _stick_after_write(self, response):
+        if self.replicas and request.method not in ('GET', 'HEAD', 'OPTIONS') and not g.get('read_only'):
+            session['db_primary_until'] = time.time() + self.sticky_seconds
+        return response
+
+
+replicas = ReplicaRouter()
+
+
+def read_only(view):
+    """Run the view's queries on a replica, unless the client just wrote."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        if replicas.replicas and not replicas.sticky():
+            g.db_replica = replicas.pick()
+        return view(*args, **kwargs)
+    return wrapper
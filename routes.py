@@ -0,0 +1,670 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, current_app, render_template, request, Response, flash, redirect, url_for, abort, stream_with_context
+from forms import *
+from sqlalchemy.exc import IntegrityError
+from models import db, Venue, Artist, Shows
+from cache import page_cache
+from db_pool import pool_stats
+from replicas import read_only
+from conditional import conditional, page_version, venues_state, artists_state, shows_state, venue_state, artist_state
+from queries import page_size, show_cursors, show_page_query, show_page, listing_filters, filter_listing, listing_page_query, listing_page, \
+  venue_shows, artist_shows, show_windows, venues_with_upcoming_counts, artists_with_upcoming_counts, venue_areas, name_search, \
+  venue_page_keys, artist_page_keys, venue_page, artist_page, venues_near
+from bookings import EXCLUSION_VIOLATION, flagged_clash, busy_query, free_slots
+from export import EXPORTS, export_rows, ndjson_chunks, csv_chunks
+
+bp = Blueprint('main', __name__)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@bp.route('/')
+def index():
+  return render_template('pages/home.html')
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@bp.route('/venues')
+@read_only
+@conditional(venues_state)
+def venues():
+  # a page of venues grouped by area, each with its number of upcoming shows,
+  # optionally filtered by genre, city and state (see listing_filters())
+  try:
+    filters = listing_filters(request.args)
+  except ValueError:
+    abort(400)
+  per_page = page_size(current_app.config['LISTING_PER_PAGE'], current_app.config['LISTING_MAX_PER_PAGE'])
+  after = request.args.get('after', type=int)
+  before = request.args.get('before', type=int)
+  isEmpty = False
+  error = False
+  try:
+    query = filter_listing(venues_with_upcoming_counts(), Venue, filters)
+    venues, pager = listing_page(listing_page_query(query, Venue, per_page, after, before).all(),
+                                 per_page, after, before)
+    
+    db.session.commit()
+    if venues == [] and not (filters or after or before):
+      isEmpty = True
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+    if ((isEmpty == False) & (error==False)):
+      return render_template('pages/venues.html', areas=venue_areas(venues), pager=pager, filters=filters);
+    elif error == True:
+      return render_template('errors/500.html'), 500
+    else:
+      return render_template('errors/404.html')
+
+@bp.route('/venues/near')
+@read_only
+@conditional(venues_state)
+def venues_near_point():
+  # venues within ?radius= km of (?lat=, ?lon=), nearest first
+  latitude = request.args.get('lat', type=float)
+  longitude = request.args.get('lon', type=float)
+  radius = request.args.get('radius', current_app.config['NEAR_DEFAULT_RADIUS_KM'], type=float)
+  if latitude is None or longitude is None or not -90 <= latitude <= 90 or not -180 <= longitude <= 180 \
+      or not 0 < radius <= current_app.config['NEAR_MAX_RADIUS_KM']:
+    abort(400)
+  error = False
+  try:
+    venues = venues_near(latitude, longitude, radius, current_app.config['NEAR_RESULTS_LIMIT']).all()
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+    if error == True:
+      return render_template('errors/500.html'), 500
+    return render_template('pages/venues_near.html', venues=venues, latitude=latitude, longitude=longitude,
+                           radius=radius)
+
+@bp.route('/venues/search', methods=['POST'])
+@read_only
+def search_venues():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for Hop should return "The Musical Hop".
+  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+  search = request.form.get('search_term', '')
+  res = name_search(venues_with_upcoming_counts(), Venue.name, search).all()
+  response = {}
+  response['data'] = [{'id': venue.id, 'name': venue.name, 'num_upcoming_shows': venue.num_upcoming_shows} for venue in res]
+  response['count'] = len(res)
+
+  return render_template('pages/search_venues.html', results=response, search_term=search)
+
+@bp.route('/venues/<int:venue_id>')
+@read_only
+@conditional(venue_state)
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  version = page_version()
+  if version is not None:
+    page = page_cache.get(('venue', venue_id), version)
+    if page is not None:
+      return page
+  error = False
+  data = {}
+  try:
+    venue = Venue.query.get(venue_id)
+    upcoming_shows, past_shows = show_windows(venue_shows(venue_id), current_app.config['DETAIL_SHOWS_LIMIT'])
+
+    data = venue_page(venue, upcoming_shows, past_shows)
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    if error == False:
+      db.session.close()
+      page = render_template('pages/show_venue.html', venue=data)
+      if version is not None:
+        page_cache.set(('venue', venue_id), page, version)
+      return page
+    else:
+      return render_template('errors/500.html'), 500
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # TODO: insert form data as a new Venue record in the db, instead
+  data = {}
+  error = False
+  form = VenueForm()
+  try:
+    name = request.form['name']
+    city = request.form['city']
+    state = request.form['state']
+    address = request.form['address']
+    phone = request.form['phone']
+    genres = request.form.getlist('genres')
+    facebook_link = request.form['facebook_link']
+    image_link = request.form['image_link']
+    website_link = request.form['website_link']
+    if VenueForm(seeking_talent=form.seeking_talent.data) == 'y':
+      seeking_talent=True 
+    else:
+      seeking_talent=False
+    seeking_description = request.form['seeking_description']
+
+    venue = Venue(name=name, city=city, state=state, address=address, 
+            phone=phone, genres=genres, facebook_link=facebook_link, 
+            image_link=image_link, website_link=website_link, 
+            seeking_talent=seeking_talent, seeking_description=seeking_description)
+    db.session.add(venue)
+    db.session.commit()
+    print(venue)
+    # TODO: modify data to be the data object returned from db insertion
+    data['name'] = venue.name
+    data['city'] = venue.city
+    data['state'] = venue.state
+    data['address'] = venue.address
+    data['phone'] = venue.phone
+    data['genre'] = venue.genres
+    data['facebok_link'] = venue.facebook_link
+    data['image_link'] = venue.image_link
+    data['website_link'] = venue.website_link
+    data['seeking_talent'] = venue.seeking_talent
+    data['seeking_description'] = venue.seeking_description
+    # on successful db insert, flash success
+    flash('Venue ' + data['name']+ ' was successfully listed!')
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    if error == False:
+      db.session.close()
+      return render_template('pages/home.html')
+    else:
+      flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+      return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # TODO: Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+  try:
+    stale = venue_page_keys(int(venue_id))
+    Venue.query.filter_by(id=venue_id).delete()
+    db.session.commit()
+    page_cache.invalidate(*stale)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    return render_template('pages/home.html')
+
+#  Artists
+#  ----------------------------------------------------------------
+@bp.route('/artists')
+@read_only
+@conditional(artists_state)
+def artists():
+  # a page of artists, optionally filtered by genre, city and state
+  try:
+    filters = listing_filters(request.args)
+  except ValueError:
+    abort(400)
+  per_page = page_size(current_app.config['LISTING_PER_PAGE'], current_app.config['LISTING_MAX_PER_PAGE'])
+  after = request.args.get('after', type=int)
+  before = request.args.get('before', type=int)
+  isEmpty = False
+  error = False
+  try:
+    query = filter_listing(artists_with_upcoming_counts(), Artist, filters)
+    artist, pager = listing_page(listing_page_query(query, Artist, per_page, after, before).all(),
+                                 per_page, after, before)
+    if (artist == [] ) and not (filters or after or before):
+      isEmpty = True
+  except:
+    error = True
+    print(sys.exc_info())
+  finally:
+    if error == True:
+      return render_template('errors/500.html'), 500
+    elif isEmpty == False:
+      return render_template('pages/artists.html', artists=artist, pager=pager, filters=filters)
+    else:
+      return render_template('errors/404.html')
+
+@bp.route('/artists/search', methods=['POST'])
+@read_only
+def search_artists():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+  search = request.form.get('search_term', '')
+  res = name_search(artists_with_upcoming_counts(), Artist.name, search).all()
+  response = {}
+  response['data'] = [{'id': artist.id, 'name': artist.name, 'num_upcoming_shows': artist.num_upcoming_shows} for artist in res]
+  response['count'] = len(res)
+
+  return render_template('pages/search_artists.html', results=response, search_term=search)
+
+@bp.route('/artists/<int:artist_id>')
+@read_only
+@conditional(artist_state)
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  version = page_version()
+  if version is not None:
+    page = page_cache.get(('artist', artist_id), version)
+    if page is not None:
+      return page
+  error = False
+  data = {}
+  try:
+    artist = Artist.query.get(artist_id)
+    upcoming_shows, past_shows = show_windows(artist_shows(artist_id), current_app.config['DETAIL_SHOWS_LIMIT'])
+
+    data = artist_page(artist, upcoming_shows, past_shows)
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+    if error == True:
+      return render_template('errors/500.html'), 500
+    page = render_template('pages/show_artist.html', artist=data)
+    if version is not None:
+      page_cache.set(('artist', artist_id), page, version)
+    return page
+
+#  Update
+#  ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  form = ArtistForm()
+  try:
+    artist = Artist.query.get(artist_id)
+    #db.session.commit()
+    artist1={
+      "id": 4,
+      "name": "Guns N Petals",
+      "genres": ["Rock n Roll"],
+      "city": "San Francisco",
+      "state": "CA",
+      "phone": "326-123-5000",
+      "website": "https://www.gunsnpetalsband.com",
+      "facebook_link": "https://www.facebook.com/GunsNPetals",
+      "seeking_venue": True,
+      "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
+      "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80"
+    }
+    # TODO: populate form with fields from artist with ID <artist_id>
+    form.name.data = artist.name
+    form.genres.data = artist.genres
+    form.city.data = artist.city
+    form.state.data = artist.state
+    form.phone.data = artist.phone
+    form.website_link.data = artist.website_link
+    form.facebook_link.data = artist.facebook_link
+    form.seeking_venue.data = artist.seeking_venue
+    form.seeking_description.data = artist.seeking_description
+    form.image_link.data = artist.image_link
+  except:
+    print(sys.exc_info())
+  finally:
+    db.session.close()  
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  error = False
+  # TODO: take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+  form = ArtistForm()
+  try:
+    artist = Artist.query.get(artist_id)
+    artist.name = ArtistForm(name=form.name.data)
+    artist.city = ArtistForm(city=form.city.data)
+    artist.state = ArtistForm(state=form.state.data)
+    artist.phone = ArtistForm(phone=form.phone.data)
+    artist.genres = ArtistForm(genres=form.genres.data)
+    artist.facebook_link = ArtistForm(facebook_link=form.facebook_link.data)
+    artist.website_link = ArtistForm(website_link=form.website_link.data)
+    artist.image_link = ArtistForm(image_link=form.image_link.data)
+    artist.seeking_venue = ArtistForm(state=form.seeking_venue.data) != None
+    artist.seeking_description = ArtistForm(state=form.seeking_description.data)
+
+    db.session.add(artist)
+    db.session.commit()
+    page_cache.invalidate(*artist_page_keys(artist_id))
+    print(artist.genres)
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    if error == False:
+      db.session.close()
+      return redirect(url_for('.show_artist', artist_id=artist_id))
+    else:
+      return render_template('errors/500.html')
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  error = False
+  form = VenueForm()
+  try:
+    venue = Venue.query.get(venue_id)
+    db.session.commit()
+    venues={
+      "id": 1,
+      "name": "The Musical Hop",
+      "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
+      "address": "1015 Folsom Street",
+      "city": "San Francisco",
+      "state": "CA",
+      "phone": "123-123-1234",
+      "website": "https://www.themusicalhop.com",
+      "facebook_link": "https://www.facebook.com/TheMusicalHop",
+      "seeking_talent": True,
+      "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
+      "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60"
+    }
+    # populate form with values from venue with ID <venue_id>
+    form.name.data = venue.name
+    form.genres.data = venue.genres
+    form.address.data = venue.address
+    form.city.data = venue.city
+    form.state.data = venue.state
+    form.phone.data = venue.phone
+    form.website_link.data = venue.website_link
+    form.facebook_link.data = venue.facebook_link
+    form.seeking_talent.data = venue.seeking_talent
+    form.seeking_description.data = venue.seeking_description
+    form.image_link.data = venue.image_link
+  except:
+    error = True
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+    if error == False:
+      return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+    else:
+      render_template('errors/500.html')
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # TODO: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+  error = False
+  form = VenueForm()
+  try:
+    venue = Venue.query.get(venue_id)
+    venue.name = form.name.data
+    venue.genres = request.form.getlist('genres')
+    print(request.form.getlist('genres'))
+    venue.address = form.address.data
+    venue.city = form.city.data
+    venue.state = form.state.data
+    #venue.phone = VenueForm(phone=form.phone.data)
+    #venue.website_link = VenueForm(website_link=form.website_link.data)
+    #venue.facebook_link = VenueForm(facebook_link=form.facebook_link.data)
+    venue.seeking_talent = form.seeking_talent.data
+    #venue.seeking_description = VenueForm(seeking_description=form.seeking_description.data)
+    #venue.image_link = VenueForm(state=form.image_link.data)
+
+    db.session.add(venue)
+    db.session.commit()
+    page_cache.invalidate(*venue_page_keys(venue_id))
+
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+    if error == False:
+      return redirect(url_for('.show_venue', venue_id=venue_id))
+    else:
+      return render_template('errors/500.html')
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  error =  False
+  data = {}
+  form = ArtistForm()
+  try:
+    # insert form data as a new Venue record in the db, instead
+    name = request.form['name']
+    city = request.form['city']
+    state = request.form['state']
+    phone = request.form['phone']
+    genres= request.form.getlist('genres')
+    facebook_link=request.form['facebook_link']
+    image_link=request.form['image_link']
+    website_link=request.form['website_link']
+    seeking_venue= request.form.get('seeking_value') != None
+    seeking_description=request.form['seeking_description']
+    artist = Artist(name=name,city=city,state=state,phone=phone,genres=genres, facebook_link=facebook_link,\
+                      image_link=image_link, website_link=website_link,seeking_venue=seeking_venue, \
+                      seeking_description=seeking_description)
+    db.session.add(artist)
+    db.session.commit()
+    # modify data to be the data object returned from db insertion
+    data['name'] = artist.name
+    # on successful db insert, flash success
+    flash('Artist ' + data['name']+ ' was successfully listed!')
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+    
+  finally:
+    db.session.close()
+    if error == False:
+      return render_template('pages/home.html')
+    else:
+      # on unsuccessful db insert, flash an error instead.
+      flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+      return render_template('forms/new_artist.html', form=form)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@bp.route('/shows')
+@read_only
+@conditional(shows_state)
+def shows():
+  # displays list of shows at /shows, one keyset page at a time
+  isEmpty = False
+  error = False
+  data = []
+  pager = {}
+  form = ShowForm()
+  per_page = page_size(current_app.config['SHOWS_PER_PAGE'], current_app.config['SHOWS_MAX_PER_PAGE'])
+  try:
+    after, before = show_cursors(request.args)
+  except ValueError:
+    abort(400)
+  try:
+    shows = show_page_query(per_page, after, before).all()
+    data, pager = show_page(shows, per_page, after, before)
+    if data == [] and not (after or before):
+      isEmpty = True
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+    if error == True:
+      return render_template('errors/500.html'), 500
+    elif isEmpty == False:
+      return render_template('pages/shows.html', shows=data, pager=pager)
+    else:
+      return redirect(url_for('.create_shows'))
+
+@bp.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+  # insert form data as a new Show record in the db, instead
+  error = False
+  form  = ShowForm()
+  if not form.duration.validate(form):
+    flash('A show lasts between 15 minutes and a day.')
+    return render_template('forms/new_show.html', form=form)
+  try:
+    artist_id = form.artist_id.data
+    venue_id = form.venue_id.data
+    start_time = form.start_time.data
+    end_time = start_time + timedelta(minutes=form.duration.data or current_app.config['SHOW_DEFAULT_MINUTES'])
+
+    # the constraints leave the double-booked shows out, those are checked here
+    if db.session.execute(flagged_clash(venue_id, artist_id, start_time, end_time)).scalar():
+      error = True
+      flash('The venue or the artist is already booked at that time. Show could not be listed.')
+    else:
+      show = Shows(artist_id=artist_id, venue_id=venue_id, start_time=start_time, end_time=end_time)
+
+      db.session.add(show)
+      db.session.commit()
+      page_cache.invalidate(('venue', int(venue_id)), ('artist', int(artist_id)))
+      # on successful db insert, flash success
+      flash('Show was successfully listed!')
+
+  except IntegrityError as e:
+    # ex_Shows_venue_booking / ex_Shows_artist_booking, see bookings.py
+    error = True
+    db.session.rollback()
+    if getattr(e.orig, 'pgcode', None) == EXCLUSION_VIOLATION:
+      flash('The venue or the artist is already booked at that time. Show could not be listed.')
+    else:
+      flash('An error occurred. Show could not be listed.')
+    print(sys.exc_info())
+  except:
+    # TODO: on unsuccessful db insert, flash an error instead.
+    # e.g., flash('An error occurred. Show could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    error = True
+    db.session.rollback()
+    flash('An error occurred. Show could not be listed.')
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+    if error == False:
+      return render_template('pages/home.html')
+    else:
+      return render_template('forms/new_show.html', form=form)
+
+#  Bookings API
+#  ----------------------------------------------------------------
+
+@bp.route('/api/venues/<int:venue_id>/free-slots')
+@read_only
+def venue_free_slots(venue_id):
+  # the gaps between the venue's shows in one ISO week (?week=2026-W42, UTC),
+  # optionally only those of at least ?min_minutes
+  try:
+    week = datetime.strptime(request.args['week'] + '-1', '%G-W%V-%u').replace(tzinfo=timezone.utc)
+    min_length = timedelta(minutes=request.args.get('min_minutes', 0, type=int))
+  except (KeyError, ValueError):
+    abort(400)
+  if min_length < timedelta(0):
+    abort(400)
+  week_end = week + timedelta(days=7)
+  error = False
+  slots = None
+  try:
+    if Venue.query.get(venue_id) is not None:
+      busy = db.session.execute(busy_query(venue_id, week, week_end)).all()
+      slots = free_slots(busy, week, week_end, min_length)
+    db.session.commit()
+  except:
+    error = True
+    db.session.rollback()
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+  if error:
+    abort(500)
+  if slots is None:
+    abort(404)
+  return {'venue_id': venue_id, 'week': request.args['week'], 'start': week.isoformat(), 'end': week_end.isoformat(),
+          'free_slots': [{'start': start.isoformat(), 'end': end.isoformat()} for start, end in slots]}
+
+#  Export API
+#  ----------------------------------------------------------------
+
+@bp.route('/api/export/<kind>')
+def export(kind):
+  # streams every row of shows / artists / venues as NDJSON (default) or CSV
+  if kind not in EXPORTS:
+    abort(404)
+  format = request.args.get('format', 'ndjson')
+  if format not in ('ndjson', 'csv'):
+    abort(400)
+  model, names = EXPORTS[kind]
+  batch_size = current_app.config['EXPORT_BATCH_SIZE']
+  rows = export_rows(model, names, batch_size)
+  if format == 'csv':
+    body, mimetype = csv_chunks(rows, names, batch_size), 'text/csv'
+  else:
+    body, mimetype = ndjson_chunks(rows, names, batch_size), 'application/x-ndjson'
+  response = Response(stream_with_context(body), mimetype=mimetype)
+  response.headers['Content-Disposition'] = 'attachment; filename=%s.%s' % (kind, format)
+  return response
+
+#  Stats
+#  ----------------------------------------------------------------
+
+@bp.route('/api/stats/pool')
+def pool_stats_json():
+  # connection pool checkout wait times for this worker process
+  return pool_stats.snapshot(db.engine.pool)
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
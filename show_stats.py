@@ -0,0 +1,104 @@
+"""Keeping the upcoming / past show counters on Venue and Artist current.
+
+The counters count shows against the refreshed_at boundary in
+show_stats_refreshed, and the count_shows trigger (see models.py) applies
+every write on "Shows" to them, so reading a count is a column read. What
+the trigger cannot see is the clock: a show stays upcoming until the
+boundary passes its start, while the detail pages split their show lists
+at now(). ``refresh_show_stats()`` moves the boundary to now() and shifts the
+shows it skipped over from upcoming to past. Under gunicorn every worker
+runs it every SHOW_STATS_REFRESH_SECONDS on a background thread (see
+``refresh_periodically()`` and gunicorn.conf.py), so the two agree to within
+that interval; anywhere else run ``flask refresh-stats --every 60``, or cron
+running ``flask refresh-stats``.
+
+``check_show_stats()`` recounts every venue and artist from "Shows" and
+repairs the rows that drifted, e.g. after a bulk load that bypassed the
+trigger (``flask generate``) or a manual fix in psql; ``flask check-stats``
+runs it and lists what it repaired.
+
+Both take the boundary row FOR UPDATE, so they serialize with each other and
+with the trigger, which holds it FOR SHARE until the writing transaction
+ends.
+"""
+import random
+import threading
+import time
+
+from sqlalchemy import text
+
+from models import db
+
+COUNTED = [('Venue', 'venue_id'), ('Artist', 'artist_id')]
+
+LOCK_BOUNDARY = text('SELECT refreshed_at, now() FROM show_stats_refreshed FOR UPDATE')
+
+ROLL_SQL = '''
+UPDATE "{table}" t SET upcoming_shows_count = t.upcoming_shows_count - d.shows,
+                       past_shows_count = t.past_shows_count + d.shows
+FROM (SELECT {key} AS id, count(*) AS shows FROM "Shows"
+      WHERE start_time >= :since AND start_time < :until GROUP BY {key}) AS d
+WHERE t.id = d.id
+RETURNING d.shows
+'''
+
+REPAIR_SQL = '''
+UPDATE "{table}" t SET upcoming_shows_count = d.upcoming, past_shows_count = d.past
+FROM (SELECT e.id, count(s.id) FILTER (WHERE s.start_time >= :boundary) AS upcoming,
+             count(s.id) FILTER (WHERE s.start_time < :boundary) AS past
+      FROM "{table}" e LEFT JOIN "Shows" s ON s.{key} = e.id GROUP BY e.id) AS d
+WHERE t.id = d.id
+  AND (t.upcoming_shows_count, t.past_shows_count) IS DISTINCT FROM (d.upcoming, d.past)
+RETURNING t.id
+'''
+
+
+def refresh_show_stats():
+    """Move the boundary to now(); returns the number of shows rolled over."""
+    moved = 0
+    with db.engine.begin() as conn:
+        since, until = conn.execute(LOCK_BOUNDARY).one()
+        if until <= since:
+            return 0
+        for table, key in COUNTED:
+            # one index range scan on start_time, bounded by the interval
+            result = conn.execute(text(ROLL_SQL.format(table=table, key=key)),
+                                  {'since': since, 'until': until})
+            if table == 'Venue':
+                moved = sum(row.shows for row in result)
+        conn.execute(text('UPDATE show_stats_refreshed SET refreshed_at = :until'), {'until': until})
+    return moved
+
+
+def check_show_stats():
+    """Recount every venue and artist; returns {table: [repaired ids]}."""
+    repaired = {}
+    with db.engine.begin() as conn:
+        boundary, _ = conn.execute(LOCK_BOUNDARY).one()
+        for table, key in COUNTED:
+            rows = conn.execute(text(REPAIR_SQL.format(table=table, key=key)), {'boundary': boundary})
+            repaired[table] = sorted(row.id for row in rows)
+    return repaired
+
+
+def refresh_periodically(app, every):
+    """Run refresh_show_stats() every ``every`` seconds on a daemon thread.
+
+    Every worker runs one; the boundary lock serializes them and a refresh
+    right after another only scans the shows that started in between.
+    """
+    def loop():
+        # spread the workers over the interval
+        time.sleep(random.uniform(0, every))
+        while True:
+            started = time.monotonic()
+            try:
+                with app.app_context():
+                    refresh_show_stats()
+            except Exception:
+                app.logger.exception('refreshing the show counters failed')
+            time.sleep(max(every - (time.monotonic() - started), 0))
+
+    thread = threading.Thread(target=loop, name='refresh-show-stats', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,141 @@
+"""Slow-query log.
+
+Statements slower than SLOW_QUERY_MS are written to a log, one JSON object
+per line, with their bind parameters and the Flask endpoint that ran them,
+e.g.::
+
+    jq -r '.endpoint' slow-queries.log | sort | uniq -c | sort -rn
+
+Every gunicorn worker appends to the same file, so the log is not rotated
+from inside the app (a RotatingFileHandler per process would rename the file
+under the other workers, which then keep writing to the old one). Rotate it
+with logrotate instead; each worker opens its own WatchedFileHandler in
+post_fork (see gunicorn.conf.py) and reopens the file once it has been moved.
+
+A SLOW_QUERY_EXPLAIN_RATE share of the slow SELECTs is run a second time
+under EXPLAIN (ANALYZE, BUFFERS) and the plan is added to the entry. ANALYZE
+executes the statement again, hence the sampling; it runs on its own cursor
+inside a savepoint, so a failing EXPLAIN never disturbs the request's
+transaction or the rows it is about to fetch.
+"""
+import json
+import logging
+import random
+import time
+from datetime import datetime
+from logging.handlers import WatchedFileHandler
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+MAX_PARAM_LENGTH = 200
+
+
+def loggable(value):
+    if isinstance(value, (list, tuple)):
+        return [loggable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: loggable(item) for key, item in value.items()}
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    value = str(value)
+    if len(value) > MAX_PARAM_LENGTH:
+        return value[:MAX_PARAM_LENGTH] + '...'
+    return value
+
+
+class SlowQueryLog(object):
+
+    def __init__(self):
+        self.threshold = 0.0
+        self.explain_rate = 0.0
+        self.logger = logging.getLogger('fyyur.slow_queries')
+        self.logger.propagate = False
+        self.random = random.random
+        self.path = None
+
+    def init_app(self, app, *engines):
+        self.threshold = app.config['SLOW_QUERY_MS'] / 1000.0
+        self.explain_rate = app.config['SLOW_QUERY_EXPLAIN_RATE']
+        if not self.threshold:
+            return
+        self.path = app.config['SLOW_QUERY_LOG']
+        self.reopen()
+        self.logger.setLevel(logging.INFO)
+        for engine in engines:
+            self.listen(engine)
+
+    def listen(self, engine):
+        if not self.threshold:
+            return
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    def reopen(self):
+        """Open a handler of this process' own; call it after forking."""
+        if self.path is None:
+            return
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            handler.close()
+        handler = WatchedFileHandler(self.path)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_started', []).append(time.perf_counter())
+
+    def _handle_error(self, context):
+        # a failed statement never reaches after_cursor_execute; drop its
+        # start time so it does not end up timing the connection's next one
+        if context.execution_context is not None and context.connection is not None:
+            started = context.connection.info.get('slow_query_started')
+            if started:
+                started.pop()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('slow_query_started')
+        if not started:
+            return
+        duration = time.perf_counter() - started.pop()
+        if duration < self.threshold:
+            return
+        entry = {
+            'at': datetime.utcnow().isoformat() + 'Z',
+            'duration_ms': round(duration * 1000.0, 3),
+            'statement': ' '.join(statement.split()),
+            'parameters': loggable(parameters),
+            'executemany': executemany,
+            'endpoint': None,
+        }
+        if conn.info.get('request_info'):
+            # run for a request on async_db.py's event loop
+            entry.update(conn.info['request_info'])
+        elif has_request_context():
+            entry.update(endpoint=request.endpoint, method=request.method, path=request.path)
+        if (not executemany and self.explain_rate and statement.lstrip()[:6].upper() == 'SELECT'
+                and self.random() < self.explain_rate):
+            entry['plan'] = self.explain(conn, statement, parameters)
+        self.logger.warning(json.dumps(entry, default=str))
+
+    def explain(self, conn, statement, parameters):
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute('SAVEPOINT slow_query_explain')
+            try:
+                cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + statement, parameters)
+                plan = cursor.fetchone()[0]
+            except Exception as error:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                plan = {'error': str(error).strip()}
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        except Exception as error:
+            # e.g. outside a transaction block, where savepoints do not exist
+            plan = {'error': str(error).strip()}
+        finally:
+            cursor.close()
+        return plan
+
+
+slow_query_log = SlowQueryLog()
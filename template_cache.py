@@ -0,0 +1,80 @@
+"""Compiled templates, shared between workers and kept across restarts.
+
+Jinja compiles a template to Python source and then to a code object the
+first time it is rendered, in every worker. With TEMPLATE_CACHE_DIR set, the
+code objects are also written there (keyed by template name and a checksum
+of its source, so an edited template is simply compiled again) and every
+other worker, and every later deploy that keeps the directory, loads them
+instead of compiling.
+
+``flask compile-templates`` fills the directory at build time, and
+gunicorn.conf.py loads every template in the master after --preload, so the
+workers fork with them already in memory.
+"""
+import os
+import tempfile
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+TEMPLATE_EXTENSIONS = ('html',)
+
+
+class SharedBytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache that several processes can write at once."""
+
+    def dump_bytecode(self, bucket):
+        # write aside and rename, so a worker reading the file never sees
+        # another one's half-written copy
+        target = self._get_cache_filename(bucket)
+        path = None
+        try:
+            fd, path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as handle:
+                bucket.write_bytecode(handle)
+            os.replace(path, target)
+        except OSError:
+            # the cache is an optimization, rendering goes on without it (a
+            # directory filled by another user may not be writable at all)
+            if path is not None:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def init_app(app):
+    directory = app.config.get('TEMPLATE_CACHE_DIR')
+    if not directory:
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as error:
+        # e.g. a read-only deploy: compile in memory, as without the setting
+        app.logger.warning('Template cache disabled, %s: %s', directory, error)
+        return
+    app.jinja_env.bytecode_cache = SharedBytecodeCache(directory)
+
+
+def template_names(app):
+    return app.jinja_env.list_templates(extensions=TEMPLATE_EXTENSIONS)
+
+
+def load_templates(app):
+    """Load (compiling, or reading from the bytecode cache) every template;
+    returns (templates loaded, milliseconds taken)."""
+    started = time.perf_counter()
+    names = template_names(app)
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names), (time.perf_counter() - started) * 1000.0
+
+
+def clear_templates(app):
+    """Drop the cached bytecode files; returns how many there were."""
+    cache = app.jinja_env.bytecode_cache
+    if cache is None:
+        return 0
+    count = len([name for name in os.listdir(cache.directory) if name.endswith('.cache')])
+    cache.clear()
+    return count
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# a scratch database; its tables are created for the run and dropped after
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+if TEST_DATABASE_URL:
+  # the app reads DATABASE_URL at import time
+  os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+
+
+@pytest.fixture(scope='session')
+def app():
+  if not TEST_DATABASE_URL:
+    pytest.skip('TEST_DATABASE_URL is not set')
+  from app import app
+  from models import db
+  app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+  with app.app_context():
+    db.drop_all(bind=None)
+    db.create_all(bind=None)
+  yield app
+  with app.app_context():
+    db.session.remove()
+    db.drop_all(bind=None)
+
+
+@pytest.fixture
+def client(app):
+  from cache import page_cache
+  page_cache.clear()
+  return app.test_client()
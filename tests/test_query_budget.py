@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from query_stats import query_budget
+
+
+@pytest.fixture(scope='module')
+def booked(app):
+  # one venue and one artist with a few shows either side of now, each with
+  # a different partner, so a lazy load per show would repeat a statement
+  from models import db, Venue, Artist, Shows
+  with app.app_context():
+    venue = Venue(name='Budget Hall', city='San Francisco', state='CA', phone='budget-venue')
+    artist = Artist(name='Budget Band', city='San Francisco', state='CA', phone='budget-artist')
+    others = [Artist(name='Other Band %d' % i, phone='budget-artist-%d' % i) for i in range(3)] + \
+             [Venue(name='Other Hall %d' % i, phone='budget-venue-%d' % i) for i in range(3)]
+    db.session.add_all([venue, artist] + others)
+    db.session.flush()
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    for i, offset in enumerate((-30, -10, 10, 30)):
+      start = now + timedelta(days=offset)
+      db.session.add(Shows(venue_id=venue.id, artist_id=others[i % 3].id, start_time=start,
+                           end_time=start + timedelta(hours=2)))
+      db.session.add(Shows(venue_id=others[3 + i % 3].id, artist_id=artist.id, start_time=start,
+                           end_time=start + timedelta(hours=2)))
+    db.session.commit()
+    ids = venue.id, artist.id
+    db.session.remove()
+  return ids
+
+
+def warm_up(client):
+  # the first statement on a new engine also runs the dialect's own queries
+  client.get('/')
+  client.get('/venues')
+
+
+@pytest.mark.parametrize('path', ['/venues/{venue_id}', '/artists/{artist_id}',
+                                  '/async/venues/{venue_id}', '/async/artists/{artist_id}'])
+def test_detail_page_budget(client, booked, path):
+  venue_id, artist_id = booked
+  url = path.format(venue_id=venue_id, artist_id=artist_id)
+  warm_up(client)
+  # the validator, the row and the upcoming / past windows; the /async pages
+  # run the last three on the asyncpg engine, counted all the same
+  with query_budget(4, max_repeats=1):
+    response = client.get(url)
+  assert response.status_code == 200
+  # served from the page cache: the validator alone
+  with query_budget(1):
+    response = client.get(url)
+  assert response.status_code == 200
+
+
+def test_budget_overrun_fails(client, booked):
+  venue_id, _ = booked
+  warm_up(client)
+  with pytest.raises(AssertionError):
+    with query_budget(1):
+      client.get('/venues/%d' % venue_id)